@@ -43,6 +43,9 @@ CREATE TABLE IF NOT EXISTS log_entry (
 
     log_type_id     SMALLINT NOT NULL,
     action_type_id  UUID,
+    -- Copy of action_type.name, written at ingest so queries filter and
+    -- group on it without joining action_type.
+    action_type_name TEXT,
 
     log_timestamp   TIMESTAMPTZ NOT NULL,
 
@@ -67,12 +70,21 @@ CREATE TABLE IF NOT EXISTS log_entry (
 CREATE INDEX IF NOT EXISTS idx_log_entry_log_type_ts
     ON log_entry (log_type_id, log_timestamp);
 
+-- source_ip is carried in the leaf pages so Q11/Q12 can answer from the
+-- index alone
 CREATE INDEX IF NOT EXISTS idx_log_entry_action_ts
-    ON log_entry (action_type_id, log_timestamp);
+    ON log_entry (action_type_name, log_timestamp)
+    INCLUDE (source_ip);
 
 CREATE INDEX IF NOT EXISTS idx_log_entry_ts
     ON log_entry (log_timestamp);
 
+-- Block range index for wide time range scans; each log file is loaded in
+-- time order, so ranges of pages map to narrow timestamp ranges
+CREATE INDEX IF NOT EXISTS idx_log_entry_ts_brin
+    ON log_entry USING BRIN (log_timestamp)
+    WITH (pages_per_range = 32);
+
 -- Source/dest IP and block based queries (Q3, Q4, Q11–Q13)
 CREATE INDEX IF NOT EXISTS idx_log_entry_source_ts
     ON log_entry (source_ip, log_timestamp);
@@ -85,11 +97,12 @@ CREATE INDEX IF NOT EXISTS idx_log_entry_block_ts
 
 -- Size based queries (Q7)
 CREATE INDEX IF NOT EXISTS idx_log_entry_size_bytes
-    ON log_entry (size_bytes);
+    ON log_entry (size_bytes)
+    WHERE size_bytes IS NOT NULL;
 
 -- Composite index for access queries (Q11–Q13)
 CREATE INDEX IF NOT EXISTS idx_log_entry_access_methods
-    ON log_entry (log_type_id, action_type_id, log_timestamp, source_ip);
+    ON log_entry (log_type_id, action_type_name, log_timestamp, source_ip);
 
 
 -- ============================================================
@@ -132,12 +145,44 @@ CREATE INDEX IF NOT EXISTS idx_access_user_agent_trgm
 
 
 -- ============================================================
--- VIEWS FOR “STATIC” QUERIES (no parameters)
--- (Q5, Q6, Q8, Q9)
+-- MATERIALIZED VIEWS FOR WHOLE-TABLE AGGREGATES
+-- (Q1, Q4, Q5, Q6, Q8, Q9)
+-- Refreshed by the ingest after every load; each one carries a
+-- unique index so it can be refreshed CONCURRENTLY. They are NOT
+-- refreshed by fn_insert_new_log: rows inserted from the UI show up
+-- in these aggregates only after the next bulk load.
+-- Day and hour buckets are taken in UTC so they do not depend on the
+-- TimeZone of the session that refreshes them.
 -- ============================================================
 
+-- Q1. Logs per action type, pre-aggregated into UTC hour buckets
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_logs_per_action_type_hour AS
+SELECT
+    date_trunc('hour', le.log_timestamp, 'UTC') AS bucket,
+    le.action_type_name,
+    COUNT(*)::BIGINT AS logs
+FROM log_entry le
+WHERE le.action_type_name IS NOT NULL
+GROUP BY 1, 2;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_logs_per_action_type_hour
+    ON mv_logs_per_action_type_hour (bucket, action_type_name);
+
+-- Q4. Actions per block and day
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_block_actions_per_day AS
+SELECT
+    le.block_id AS block_id,
+    (le.log_timestamp AT TIME ZONE 'UTC')::date AS day,
+    COUNT(le.action_type_id)::BIGINT AS total_actions
+FROM log_entry le
+WHERE le.block_id IS NOT NULL
+GROUP BY le.block_id, (le.log_timestamp AT TIME ZONE 'UTC')::date;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_block_actions_per_day
+    ON mv_block_actions_per_day (day, block_id);
+
 -- Q5. Referrers that have led to more than one resource
-CREATE OR REPLACE VIEW v_referrers_multiple_resources AS
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_referrers_multiple_resources AS
 SELECT
     lad.referrer AS referrer,
     COUNT(lad.resource) AS resource_frequency
@@ -146,8 +191,11 @@ WHERE lad.referrer IS NOT NULL
 GROUP BY lad.referrer
 HAVING COUNT(lad.resource) > 1;
 
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_referrers_multiple_resources
+    ON mv_referrers_multiple_resources (referrer);
+
 -- Q6. Second most common resource requested
-CREATE OR REPLACE VIEW v_second_most_common_resource AS
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_second_most_common_resource AS
 SELECT resource, frequency
 FROM (
     SELECT
@@ -159,34 +207,40 @@ FROM (
 ) t
 WHERE t.rnk = 2;
 
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_second_most_common_resource
+    ON mv_second_most_common_resource (resource);
+
 -- Q8. Blocks replicated and served on the same day
-CREATE OR REPLACE VIEW v_blocks_rep_and_serv_same_day AS
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_blocks_rep_and_serv_same_day AS
 SELECT
-    le.block_id
+    le.block_id,
+    (le.log_timestamp AT TIME ZONE 'UTC')::date AS day
 FROM log_entry le
-JOIN action_type at2
-    ON le.action_type_id = at2.id
-   AND at2.name IN ('replicate', 'served')
+WHERE le.action_type_name IN ('replicate', 'served')
 GROUP BY
     le.block_id,
-    le.log_timestamp::date
-HAVING COUNT(DISTINCT at2.name) > 1
-ORDER BY le.block_id DESC;
+    (le.log_timestamp AT TIME ZONE 'UTC')::date
+HAVING COUNT(DISTINCT le.action_type_name) > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_blocks_rep_and_serv_same_day
+    ON mv_blocks_rep_and_serv_same_day (block_id, day);
 
 -- Q9. Blocks replicated and served on the same day and hour
-CREATE OR REPLACE VIEW v_blocks_rep_and_serv_same_day_hour AS
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_blocks_rep_and_serv_same_day_hour AS
 SELECT
-    le.block_id
+    le.block_id,
+    (le.log_timestamp AT TIME ZONE 'UTC')::date AS day,
+    EXTRACT(HOUR FROM le.log_timestamp AT TIME ZONE 'UTC') AS hour
 FROM log_entry le
-JOIN action_type at2
-    ON le.action_type_id = at2.id
-   AND at2.name IN ('replicate', 'served')
+WHERE le.action_type_name IN ('replicate', 'served')
 GROUP BY
     le.block_id,
-    le.log_timestamp::date,
-    EXTRACT(HOUR FROM le.log_timestamp)
-HAVING COUNT(DISTINCT at2.name) > 1
-ORDER BY le.block_id DESC;
+    (le.log_timestamp AT TIME ZONE 'UTC')::date,
+    EXTRACT(HOUR FROM le.log_timestamp AT TIME ZONE 'UTC')
+HAVING COUNT(DISTINCT le.action_type_name) > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_blocks_rep_and_serv_same_day_hour
+    ON mv_blocks_rep_and_serv_same_day_hour (block_id, day, hour);
 
 
 -- ============================================================
@@ -195,6 +249,9 @@ ORDER BY le.block_id DESC;
 -- ============================================================
 
 -- Q1. Total logs per action type in a time range
+--     Whole hours inside the range are read from the hourly materialized
+--     view; only the partial hours at either edge touch log_entry. Logs
+--     inserted since the last bulk load are counted only in those edges.
 CREATE OR REPLACE FUNCTION fn_total_logs_per_action_type(
     p_start TIMESTAMPTZ,
     p_end   TIMESTAMPTZ
@@ -203,14 +260,29 @@ RETURNS TABLE(action_type_name TEXT, logs BIGINT)
 LANGUAGE sql
 STABLE
 AS $$
+WITH bounds AS (
+    SELECT
+        date_trunc('hour', p_start + INTERVAL '1 hour' - INTERVAL '1 microsecond', 'UTC') AS full_start,
+        date_trunc('hour', p_end, 'UTC') AS full_end
+),
+counts AS (
+    SELECT mv.action_type_name, mv.logs
+    FROM mv_logs_per_action_type_hour mv, bounds b
+    WHERE mv.bucket >= b.full_start
+      AND mv.bucket <  b.full_end
+    UNION ALL
+    SELECT le.action_type_name, COUNT(*)::BIGINT
+    FROM log_entry le, bounds b
+    WHERE le.log_timestamp BETWEEN p_start AND p_end
+      AND (le.log_timestamp < b.full_start OR le.log_timestamp >= b.full_end)
+      AND le.action_type_name IS NOT NULL
+    GROUP BY le.action_type_name
+)
 SELECT
-    at.name AS action_type_name,
-    COUNT(*)::BIGINT AS logs
-FROM log_entry le
-JOIN action_type at
-  ON at.id = le.action_type_id
-WHERE le.log_timestamp BETWEEN p_start AND p_end
-GROUP BY at.name
+    action_type_name,
+    SUM(logs)::BIGINT AS logs
+FROM counts
+GROUP BY action_type_name
 ORDER BY logs DESC;
 $$;
 
@@ -229,9 +301,7 @@ SELECT
     le.log_timestamp::date AS day,
     COUNT(*)::BIGINT       AS total_logs
 FROM log_entry le
-JOIN action_type at
-  ON le.action_type_id = at.id
-WHERE at.name = p_action_name
+WHERE le.action_type_name = p_action_name
   AND le.log_timestamp BETWEEN p_start AND p_end
 GROUP BY le.log_timestamp::date
 ORDER BY total_logs DESC;
@@ -249,17 +319,17 @@ AS $$
 WITH ranked AS (
     SELECT
         le.source_ip,
-        at.name AS action_type_name,
+        le.action_type_name,
         COUNT(*)::BIGINT AS frequency,
         RANK() OVER (
             PARTITION BY le.source_ip
             ORDER BY COUNT(*) DESC
         ) AS rnk
     FROM log_entry le
-    JOIN action_type at
-      ON le.action_type_id = at.id
-    WHERE le.log_timestamp::date = p_day
-    GROUP BY le.source_ip, at.name
+    WHERE le.log_timestamp >= p_day
+      AND le.log_timestamp <  p_day + 1
+      AND le.action_type_name IS NOT NULL
+    GROUP BY le.source_ip, le.action_type_name
 )
 SELECT
     source_ip,
@@ -272,6 +342,7 @@ $$;
 
 
 -- Q4. Top-N block IDs by total number of actions per day in a date range
+--     Read from the materialized view: UTC days, as of the last bulk load.
 CREATE OR REPLACE FUNCTION fn_top_blocks_by_actions_per_day(
     p_start DATE,
     p_end   DATE,
@@ -282,38 +353,38 @@ LANGUAGE sql
 STABLE
 AS $$
 SELECT
-    le.block_id AS block_id,
-    le.log_timestamp::date AS day,
-    COUNT(le.action_type_id)::BIGINT AS total_actions
-FROM log_entry le
-WHERE le.log_timestamp::date >= p_start
-  AND le.log_timestamp::date <  p_end
-  AND le.block_id IS NOT NULL
-GROUP BY le.block_id, le.log_timestamp::date
-ORDER BY total_actions DESC
+    mv.block_id,
+    mv.day,
+    mv.total_actions
+FROM mv_block_actions_per_day mv
+WHERE mv.day >= p_start
+  AND mv.day <  p_end
+ORDER BY mv.total_actions DESC
 LIMIT p_limit;
 $$;
 
 
--- Q5. Referrers that led to more than one resource (wrapper over view)
+-- Q5. Referrers that led to more than one resource (wrapper over materialized view,
+--     as of the last bulk load)
 CREATE OR REPLACE FUNCTION fn_referrers_multiple_resources()
 RETURNS TABLE(referrer TEXT, resource_frequency BIGINT)
 LANGUAGE sql
 STABLE
 AS $$
 SELECT referrer, resource_frequency
-FROM v_referrers_multiple_resources;
+FROM mv_referrers_multiple_resources;
 $$;
 
 
--- Q6. Second most common resource requested (wrapper over view)
+-- Q6. Second most common resource requested (wrapper over materialized view,
+--     as of the last bulk load)
 CREATE OR REPLACE FUNCTION fn_second_most_common_resource()
 RETURNS TABLE(resource TEXT, frequency BIGINT)
 LANGUAGE sql
 STABLE
 AS $$
 SELECT resource, frequency
-FROM v_second_most_common_resource;
+FROM mv_second_most_common_resource;
 $$;
 
 
@@ -363,25 +434,29 @@ WHERE le.size_bytes IS NOT NULL
 $$;
 
 
--- Q8. Blocks replicated and served same day (wrapper over view)
+-- Q8. Blocks replicated and served same day (wrapper over materialized view,
+--     as of the last bulk load)
 CREATE OR REPLACE FUNCTION fn_blocks_rep_and_serv_same_day()
 RETURNS TABLE(block_id BIGINT)
 LANGUAGE sql
 STABLE
 AS $$
 SELECT block_id
-FROM v_blocks_rep_and_serv_same_day;
+FROM mv_blocks_rep_and_serv_same_day
+ORDER BY block_id DESC;
 $$;
 
 
--- Q9. Blocks replicated and served same day and hour (wrapper over view)
+-- Q9. Blocks replicated and served same day and hour (wrapper over materialized view,
+--     as of the last bulk load)
 CREATE OR REPLACE FUNCTION fn_blocks_rep_and_serv_same_day_hour()
 RETURNS TABLE(block_id BIGINT)
 LANGUAGE sql
 STABLE
 AS $$
 SELECT block_id
-FROM v_blocks_rep_and_serv_same_day_hour;
+FROM mv_blocks_rep_and_serv_same_day_hour
+ORDER BY block_id DESC;
 $$;
 
 
@@ -444,12 +519,8 @@ STABLE
 AS $$
 SELECT DISTINCT le.source_ip
 FROM log_entry le
-JOIN log_type lt
-  ON lt.id = le.log_type_id
-JOIN action_type at
-  ON at.id = le.action_type_id
-WHERE lt.name = p_log_type_name
-  AND at.name = p_http_method
+WHERE le.log_type_id = (SELECT lt.id FROM log_type lt WHERE lt.name = p_log_type_name)
+  AND le.action_type_name = p_http_method
   AND le.log_timestamp >= p_start
   AND le.log_timestamp <  p_end;
 $$;
@@ -470,16 +541,12 @@ AS $$
 SELECT
     le.source_ip
 FROM log_entry le
-JOIN log_type lt
-  ON lt.id = le.log_type_id
-JOIN action_type at
-  ON at.id = le.action_type_id
-WHERE lt.name = p_log_type_name
-  AND at.name IN (p_method1, p_method2)
+WHERE le.log_type_id = (SELECT lt.id FROM log_type lt WHERE lt.name = p_log_type_name)
+  AND le.action_type_name IN (p_method1, p_method2)
   AND le.log_timestamp >= p_start
   AND le.log_timestamp <  p_end
 GROUP BY le.source_ip
-HAVING COUNT(DISTINCT at.name) = 2;
+HAVING COUNT(DISTINCT le.action_type_name) = 2;
 $$;
 
 
@@ -497,18 +564,15 @@ STABLE
 AS $$
 SELECT
     le.source_ip,
-    COUNT(DISTINCT at.name) AS cnt,
-    STRING_AGG(DISTINCT at.name, '|' ORDER BY at.name) AS methods
+    COUNT(DISTINCT le.action_type_name) AS cnt,
+    STRING_AGG(DISTINCT le.action_type_name, '|' ORDER BY le.action_type_name) AS methods
 FROM log_entry le
-JOIN log_type lt
-  ON lt.id = le.log_type_id
-JOIN action_type at
-  ON at.id = le.action_type_id
-WHERE lt.name = p_log_type_name
+WHERE le.log_type_id = (SELECT lt.id FROM log_type lt WHERE lt.name = p_log_type_name)
   AND le.log_timestamp >= p_start
   AND le.log_timestamp <  p_end
+  AND le.action_type_name IS NOT NULL
 GROUP BY le.source_ip
-HAVING COUNT(DISTINCT at.name) = p_required_methods
+HAVING COUNT(DISTINCT le.action_type_name) = p_required_methods
 ORDER BY cnt DESC;
 $$;
 
@@ -563,6 +627,7 @@ BEGIN
         id,
         log_type_id,
         action_type_id,
+        action_type_name,
         log_timestamp,
         source_ip,
         dest_ip,
@@ -573,6 +638,7 @@ BEGIN
         v_new_id,
         v_log_type_id,
         v_action_type_id,
+        p_action_type_name,
         p_log_timestamp,
         p_source_ip,
         p_dest_ip,
@@ -4,10 +4,11 @@ Ingest pipeline entrypoint.
 
 This module performs a full ingestion cycle consisting of:
 
-1. Parsing raw log files from ``INPUT_DIR`` using ``run_parser``.
+1. Locating the raw log files in ``INPUT_DIR``.
 2. Establishing a PostgreSQL connection using environment variables.
-3. Inserting the parsed rows into the database via ``insert_logs`` with
-   batched ingestion.
+3. Parsing and inserting the rows via ``load``, one worker process and
+   connection per line-aligned range of each file, streaming parsed rows
+   into batched COPYs.
 4. Reporting progress and errors through ``tiny_logger``.
 
 The script is designed to run non-interactively inside Docker Compose.
@@ -15,11 +16,12 @@ The script is designed to run non-interactively inside Docker Compose.
 
 import os
 import psycopg2
-from typing import Dict, List, Any
+from functools import partial
+from typing import Callable, Dict, Iterable, List
 
-from parser import parse_access, parse_dataxceiver, parse_namesystem
+from parser import Row, split_ranges, parse_access, parse_dataxceiver, parse_namesystem
 from loader import load
-from util import tiny_logger, LogType
+from util import tiny_logger, LogType, DEBUG_ENABLED
 
 INPUT_DIR = "/input-logfiles"
 
@@ -29,48 +31,41 @@ PARSERS = {
     LogType.HDFS_NAMESYSTEM: parse_namesystem,
 }
 
-def parse() -> Dict[str, List[Dict[str, Any]]]:
+def sources() -> Dict[str, List[Callable[[], Iterable[Row]]]]:
     result = {}
     for lt in LogType:
-        parser = PARSERS[lt]
         path = os.path.join(INPUT_DIR, lt.filename)
-        tiny_logger(f"Parsing {path} ...")
-        result[lt.value] = parser(path)
+        result[lt.value] = [
+            partial(PARSERS[lt], path, start, end, debug_csv=DEBUG_ENABLED)
+            for start, end in split_ranges(path)
+        ]
     return result
 
+def connect():
+    """
+    Open a new PostgreSQL connection from the ``PG*`` environment variables.
+    """
+    return psycopg2.connect(
+        dbname=os.getenv("PGDATABASE", "logdb"),
+        user=os.getenv("PGUSER", "admin"),
+        password=os.getenv("PGPASSWORD", "admin123!"),
+        host=os.getenv("PGHOST", "postgres"),
+        port=os.getenv("PGPORT", "5432"),
+    )
+
 def main():
     """
     Execute the full ingestion workflow.
 
-    The workflow consists of parsing, database connection, and
-    uploading parsed rows into the ``log_entry`` and associated tables.
+    The workflow consists of database connection, then parsing and
+    uploading the rows into the ``log_entry`` and associated tables.
     Progress and errors are logged via ``tiny_logger``.
     """
     tiny_logger("=== INGEST START ===")
 
-    tiny_logger("Parsing input-logfiles...")
-    try:
-        parsed = parse()
-    except Exception as exc:
-        tiny_logger(f"Parsing failed: {exc}")
-        raise
-
-    stats = {
-        lt.value: len(parsed.get(lt.value, []))
-        for lt in LogType
-    }
-
-    tiny_logger(f"Parse stats: {stats}")
-
     tiny_logger("Connecting to PostgreSQL...")
     try:
-        conn = psycopg2.connect(
-            dbname=os.getenv("PGDATABASE", "logdb"),
-            user=os.getenv("PGUSER", "admin"),
-            password=os.getenv("PGPASSWORD", "admin123!"),
-            host=os.getenv("PGHOST", "postgres"),
-            port=os.getenv("PGPORT", "5432"),
-        )
+        conn = connect()
         tiny_logger("DB connection OK.")
     except Exception as exc:
         tiny_logger(f"Failed to connect to DB: {exc}")
@@ -78,7 +73,7 @@ def main():
 
     tiny_logger("Uploading parsed logs to DB...")
     try:
-        load(conn, parsed)
+        load(conn, sources(), connect)
     except Exception as exc:
         tiny_logger(f"Upload failed: {exc}")
         raise
@@ -1,11 +1,38 @@
-from typing import Dict, List, Any, Tuple
-import psycopg2
-from psycopg2.extras import execute_values
-
-from util import tiny_logger, LogType
+import csv
+import io
+import multiprocessing
+import multiprocessing.util
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Any
+
+from util import tiny_debug, tiny_logger, LogType
+from config import MATERIALIZED_VIEWS, MAX_LOAD_WORKERS
+from ids import deterministic_action_type_id
+from parser import DETAIL_COLUMNS, Row
 
 BATCH_SIZE = 500000
 
+ENTRY_COLUMNS = (
+    "id",
+    "log_type_id",
+    "action_type_id",
+    "action_type_name",
+    "log_timestamp",
+    "source_ip",
+    "dest_ip",
+    "block_id",
+    "size_bytes",
+)
+
+# Connections of the current load worker process. They are opened once per
+# worker and reused by every source the worker loads. Action types go
+# through their own autocommit connection, so each upsert commits at once
+# instead of holding its unique-index entry for a whole range.
+_worker_conn = None
+_worker_action_conn = None
+
 def get_log_type_ids(conn) -> Dict[str, int]:
     """
     Load all ``log_type`` rows.
@@ -27,208 +54,324 @@ def get_log_type_ids(conn) -> Dict[str, int]:
     return mapping
 
 
-def get_action_type_id(conn, name: str | None) -> int | None:
+def ensure_action_type(cur, name: str) -> str:
     """
-    Resolve or create an ``action_type``.
+    Make sure an ``action_type`` row exists for ``name``.
+
+    Action type ids are derived from the name, so the id is known without
+    a lookup and a concurrent insert of the same name yields the same row.
+    The statement must run in its own short transaction: inside a long one
+    it would hold the new name's unique-index entry, making other workers
+    that meet the name wait for that transaction, or deadlock with it.
 
     Parameters
     ----------
-    name : str or None
-        The action type name.
+    cur : cursor
+        Active psycopg2 cursor on an autocommit connection.
+    name : str
+        Action name found in a parsed log line.
 
     Returns
     -------
-    int or None
-        The id of the action type, or ``None`` if name is missing.
+    str
+        The action type id.
     """
-    if not name:
-        return None
-
-    with conn.cursor() as cur:
-        cur.execute("SELECT id FROM action_type WHERE name = %s;", (name,))
-        row = cur.fetchone()
-        if row:
-            return row[0]
-
-        cur.execute(
-            "INSERT INTO action_type (name) VALUES (%s) RETURNING id;",
-            (name,),
-        )
-        new_id = cur.fetchone()[0]
-        tiny_logger(f"Created new action_type: {name} -> id {new_id}")
-        return new_id
+    action_id = deterministic_action_type_id(name)
+    cur.execute(
+        "INSERT INTO action_type (id, name) VALUES (%s, %s) "
+        "ON CONFLICT (name) DO NOTHING;",
+        (action_id, name),
+    )
+    return action_id
+
+
+def load(
+    conn,
+    sources: Dict[str, List[Callable[[], Iterable[Row]]]],
+    connect: Callable[[], Any],
+) -> None:
+    """
+    Parse and insert all logs into the database.
 
+    Every source is parsed and loaded as its own task in a pool of worker
+    processes, each holding one connection for all of its tasks, so the
+    log types, and the ranges of large files, are ingested in parallel and
+    commit independently. Parsed rows are
+    streamed straight into COPY batches, so no log file is ever held in
+    memory as a whole.
 
-def load(conn, parsed: Dict[str, List[Dict[str, Any]]]) -> None:
-    """
-    Insert all parsed logs into the database.
+    Because every range commits on its own, a failure partway through
+    leaves the ranges that already finished committed: the tables are
+    partially loaded and the materialized views are not refreshed. The
+    load is not resumable; empty ``log_entry`` and ``log_access_detail``
+    before running it again.
 
     Parameters
     ----------
     conn : psycopg2 connection
         Active database connection.
-    parsed : dict
-        Mapping of log type name to parsed rows. Keys expected:
-        ``ACCESS``, ``HDFS_DATAXCEIVER``, ``HDFS_NAMESYSTEM``.
+    sources : dict
+        Mapping of log type name to picklable callables, each yielding the
+        parsed rows of one part of its log. Keys expected: ``ACCESS``,
+        ``HDFS_DATAXCEIVER``, ``HDFS_NAMESYSTEM``.
+    connect : callable
+        Module-level function returning a new psycopg2 connection, called
+        once in every worker process.
     """
     tiny_logger("Beginning log ingestion process...")
-    tiny_logger(f"Parsed log types present: {list(parsed.keys())}")
+    tiny_logger(f"Log types present: {list(sources.keys())}")
 
     log_type_ids = get_log_type_ids(conn)
+    # End the lookup's transaction so the parent connection does not sit
+    # idle in transaction, holding a snapshot, for the whole load.
+    conn.commit()
+
+    tasks = []
+    for key, parts in sources.items():
+        lt_name = key.upper()
+        if lt_name not in log_type_ids:
+            tiny_logger(f"Skipping unknown log_type {lt_name}")
+            continue
+
+        tiny_logger(f"Loading '{lt_name}' in {len(parts)} part(s)")
+        for source in parts:
+            tasks.append((lt_name, log_type_ids[lt_name], source))
+
+    if not tasks:
+        tiny_logger("FINAL: total inserted into log_entry = 0")
+        return
+
+    inserted_by_type: Dict[str, int] = {}
+    with ProcessPoolExecutor(
+        max_workers=min(len(tasks), os.cpu_count() or 1, MAX_LOAD_WORKERS),
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_init_worker,
+        initargs=(connect,),
+    ) as pool:
+        futures = [
+            (lt_name, pool.submit(_load_log_type, lt_id, source))
+            for lt_name, lt_id, source in tasks
+        ]
+
+        try:
+            for lt_name, future in futures:
+                inserted_by_type[lt_name] = (
+                    inserted_by_type.get(lt_name, 0) + future.result()
+                )
+        except Exception:
+            tiny_logger(
+                "Load failed: finished ranges stay committed, the tables are "
+                "partially loaded and the materialized views were not refreshed."
+            )
+            raise
+
+    for lt_name, inserted in inserted_by_type.items():
+        tiny_logger(f"Inserted {inserted} rows for '{lt_name}'")
+
+    total_rows = sum(inserted_by_type.values())
+    tiny_logger(f"FINAL: total inserted into log_entry = {total_rows}")
+
+    refresh_materialized_views(conn)
+
+
+def refresh_materialized_views(conn) -> None:
+    """
+    Refresh the materialized views built on the loaded tables.
 
+    Parameters
+    ----------
+    conn : psycopg2 connection
+        Active database connection.
+    """
     with conn:
         with conn.cursor() as cur:
-            total_rows = 0
+            for view in MATERIALIZED_VIEWS:
+                tiny_logger(f"Refreshing {view}...")
+                cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view};")
 
-            for key, rows in parsed.items():
-                lt_name = key.upper()
-                if lt_name not in log_type_ids:
-                    tiny_logger(f"Skipping unknown log_type {lt_name}")
-                    continue
 
-                lt_id = log_type_ids[lt_name]
-                tiny_logger(f"Preparing {len(rows)} rows for type '{lt_name}'")
+def _init_worker(connect: Callable[[], Any]) -> None:
+    """
+    Pool initializer: open the worker's connections and close them when
+    the worker process exits.
 
-                inserted = _insert_for_log_type(conn, cur, lt_id, rows)
-                total_rows += inserted
+    Parameters
+    ----------
+    connect : callable
+        Function returning a new psycopg2 connection.
+    """
+    global _worker_conn, _worker_action_conn
+    _worker_conn = connect()
+    multiprocessing.util.Finalize(None, _worker_conn.close, exitpriority=10)
+    _worker_action_conn = connect()
+    _worker_action_conn.autocommit = True
+    multiprocessing.util.Finalize(None, _worker_action_conn.close, exitpriority=10)
 
-                tiny_logger(f"Inserted {inserted} rows for '{lt_name}'")
 
-            tiny_logger(f"FINAL: total inserted into log_entry = {total_rows}")
+def _load_log_type(log_type_id: int, source: Callable[[], Iterable[Row]]) -> int:
+    """
+    Worker entry point: parse and load one source over the worker's
+    connection.
 
+    Parameters
+    ----------
+    log_type_id : int
+        ID of the log type.
+    source : callable
+        Returns an iterable of parsed rows of this log type.
 
-def _insert_for_log_type(conn, cur, log_type_id: int, rows: List[Dict[str, Any]]) -> int:
+    Returns
+    -------
+    int
+        Number of inserted ``log_entry`` rows.
+    """
+    with _worker_conn:
+        with _worker_conn.cursor() as cur, _worker_action_conn.cursor() as action_cur:
+            # Each source is one transaction; its single commit
+            # need not wait for the WAL flush.
+            cur.execute("SET LOCAL synchronous_commit TO OFF;")
+            return _insert_for_log_type(cur, action_cur, log_type_id, source())
+
+
+def _insert_for_log_type(
+    cur, action_cur, log_type_id: int, rows: Iterable[Row]
+) -> int:
     """
     Insert all rows of a specific log type in batches.
 
+    Action types are created the first time their name is seen, committed
+    on their own before the entries referencing them are copied.
+
     Parameters
     ----------
+    cur : cursor
+        Cursor of the source's transaction, used for the COPYs.
+    action_cur : cursor
+        Cursor on the worker's autocommit connection, used for action types.
     log_type_id : int
         ID of the log type.
-    rows : list of dict
-        Parsed rows for this log type.
+    rows : iterable of tuple
+        Parsed rows for this log type, in ``parser.ROW_COLUMNS`` order.
 
     Returns
     -------
     int
         Number of inserted ``log_entry`` rows.
     """
-    entry_batch: List[Tuple[Any, ...]] = []
-    detail_staging: List[Tuple[int, Dict[str, Any]]] = []
+    # Rows are written to the COPY buffers as they are parsed instead of
+    # being collected as tuples first; a batch is held only as CSV text.
+    entry_buf = io.StringIO()
+    detail_buf = io.StringIO()
+    write_entry = csv.writer(entry_buf).writerow
+    write_detail = csv.writer(detail_buf).writerow
+    entry_count = 0
+    detail_count = 0
+
+    action_type_ids: Dict[str, str] = {}
     inserted_count = 0
 
-    for row in rows:
-        action_name = row.get("action_type_name")
-        action_id = get_action_type_id(conn, action_name)
-
-        idx = len(entry_batch)
-        entry_batch.append(
-            (
-                log_type_id,
-                action_id,
-                row.get("log_timestamp"),
-                row.get("source_ip"),
-                row.get("dest_ip"),
-                row.get("block_id"),
-                row.get("size_bytes"),
-            )
-        )
+    for _, action_name, timestamp, source_ip, dest_ip, block_id, size_bytes, detail in rows:
+        action_id = action_type_ids.get(action_name)
+        if action_id is None and action_name:
+            action_id = ensure_action_type(action_cur, action_name)
+            action_type_ids[action_name] = action_id
 
-        if row.get("detail"):
-            detail_staging.append((idx, row["detail"]))
+        entry_id = str(uuid.uuid4())
+        write_entry((
+            entry_id,
+            log_type_id,
+            action_id,
+            action_name,
+            timestamp,
+            source_ip,
+            dest_ip,
+            block_id,
+            size_bytes,
+        ))
+        entry_count += 1
 
-        if len(entry_batch) >= BATCH_SIZE:
-            inserted = _flush_entry_batch(cur, entry_batch, detail_staging)
-            inserted_count += inserted
-            entry_batch.clear()
-            detail_staging.clear()
+        if detail:
+            write_detail((entry_id, *detail))
+            detail_count += 1
 
-    if entry_batch:
-        inserted = _flush_entry_batch(cur, entry_batch, detail_staging)
-        inserted_count += inserted
+        if entry_count >= BATCH_SIZE:
+            inserted_count += _flush_entry_batch(
+                cur, entry_buf, entry_count, detail_buf, detail_count
+            )
+            entry_count = 0
+            detail_count = 0
+
+    if entry_count:
+        inserted_count += _flush_entry_batch(
+            cur, entry_buf, entry_count, detail_buf, detail_count
+        )
 
     return inserted_count
 
 
-def _flush_entry_batch(cur, entry_batch, detail_staging) -> int:
+def _flush_entry_batch(
+    cur,
+    entry_buf: io.StringIO,
+    entry_count: int,
+    detail_buf: io.StringIO,
+    detail_count: int,
+) -> int:
     """
     Flush a batch of ``log_entry`` rows and associated ``log_access_detail`` rows.
 
+    Entry ids are generated client-side, so both row sets are COPYed
+    straight into their final tables without waiting on RETURNING. Both
+    buffers are emptied afterwards so the caller can keep writing to them.
+
     Parameters
     ----------
     cur : cursor
         Active psycopg2 cursor.
-    entry_batch : list
-        Batched ``log_entry`` rows.
-    detail_staging : list
-        Staged ACCESS detail rows, storing index -> detail mapping.
+    entry_buf : io.StringIO
+        CSV ``log_entry`` rows, each starting with its generated id.
+    entry_count : int
+        Number of rows in ``entry_buf``.
+    detail_buf : io.StringIO
+        CSV ACCESS detail rows, each starting with its entry id.
+    detail_count : int
+        Number of rows in ``detail_buf``.
 
     Returns
     -------
     int
         Number of inserted ``log_entry`` rows.
     """
-    if not entry_batch:
+    if not entry_count:
         return 0
 
-    tiny_logger(f"Flushing batch of {len(entry_batch)} rows")
+    tiny_debug("Flushing batch of %d rows", entry_count)
 
-    entry_sql = """
-        INSERT INTO log_entry (
-            log_type_id,
-            action_type_id,
-            log_timestamp,
-            source_ip,
-            dest_ip,
-            block_id,
-            size_bytes
-        )
-        VALUES %s
-        RETURNING id;
-    """
+    entry_cols = ", ".join(ENTRY_COLUMNS)
+    detail_cols = "log_entry_id, " + ", ".join(DETAIL_COLUMNS)
+
+    entry_buf.seek(0)
+    detail_buf.seek(0)
 
     try:
-        returned = execute_values(cur, entry_sql, entry_batch, fetch=True)
-        entry_ids = [row[0] for row in returned]
+        cur.copy_expert(
+            f"COPY log_entry ({entry_cols}) FROM STDIN WITH (FORMAT csv)",
+            entry_buf,
+        )
+        if detail_count:
+            tiny_debug("Copying %d ACCESS detail rows", detail_count)
+            cur.copy_expert(
+                f"COPY log_access_detail ({detail_cols}) "
+                "FROM STDIN WITH (FORMAT csv)",
+                detail_buf,
+            )
     except Exception as exc:
         tiny_logger("Failed to insert log_entry batch")
         raise
 
-    tiny_logger(f"Inserted {len(entry_ids)} log_entry rows")
-
-    if detail_staging:
-        tiny_logger(f"Inserting {len(detail_staging)} ACCESS detail rows")
-
-        detail_vals = []
-        for idx, detail in detail_staging:
-            detail_vals.append(
-                (
-                    entry_ids[idx],
-                    detail.get("remote_name"),
-                    detail.get("auth_user"),
-                    detail.get("http_method"),
-                    detail.get("resource"),
-                    detail.get("http_status"),
-                    detail.get("referrer"),
-                    detail.get("user_agent"),
-                )
-            )
-
-        detail_sql = """
-            INSERT INTO log_access_detail (
-                log_entry_id,
-                remote_name,
-                auth_user,
-                http_method,
-                resource,
-                http_status,
-                referrer,
-                user_agent
-            )
-            VALUES %s;
-        """
+    for buf in (entry_buf, detail_buf):
+        buf.seek(0)
+        buf.truncate()
 
-        execute_values(cur, detail_sql, detail_vals)
-        tiny_logger("ACCESS detail insertion complete")
+    tiny_debug("Inserted %d log_entry rows", entry_count)
 
-    return len(entry_ids)
+    return entry_count
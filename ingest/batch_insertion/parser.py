@@ -1,103 +1,175 @@
 #!/usr/bin/env python3
 import re
 import os
-from datetime import datetime
-from typing import Callable, Dict, List, Optional, Any
+import ipaddress
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, List, Optional, Any, Tuple
 import csv
 
 from util import tiny_logger
+from timestamps import ts_apache, ts_hdfs_compact
 
 
-def write_rows_to_csv(path: str, rows: list) -> str | None:
-    if not rows:
-        return None
-
+# Debug aid: passes rows through unchanged while writing a copy of them
+# to .parsed/, one CSV per parsed file range.
+def write_rows_to_csv(path: str, start: int, rows: Iterable["Row"]) -> Iterator["Row"]:
     os.makedirs(".parsed", exist_ok=True)
 
-    out_name = os.path.basename(path) + ".csv"
+    out_name = os.path.basename(path) + (f".{start}" if start else "") + ".csv"
     out_path = os.path.join(".parsed", out_name)
 
-    fieldnames = list(rows[0].keys())
-
     with open(out_path, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
-
-    return out_path
+        writer = csv.writer(csvfile)
+        writer.writerow(ROW_COLUMNS)
+        for row in rows:
+            writer.writerow(row)
+            yield row
+
+
+# HDFS logs only reference a few dozen datanodes, so every distinct address
+# is parsed once and the same object is shared by all rows that mention it.
+@lru_cache(maxsize=4096)
+def parse_ip(s: str) -> ipaddress.IPv4Address:
+    return ipaddress.IPv4Address(s)
+
+
+# Parsers yield one tuple per row, in this column order, so rows can be
+# streamed into COPY without ever holding a whole file in memory.
+ROW_COLUMNS = (
+    "log_type_name",
+    "action_type_name",
+    "log_timestamp",
+    "source_ip",
+    "dest_ip",
+    "block_id",
+    "size_bytes",
+    "detail",
+)
 
+# ACCESS rows carry their log_access_detail values as a tuple in this
+# order, matching the table's columns; other rows carry None.
+DETAIL_COLUMNS = (
+    "remote_name",
+    "auth_user",
+    "resource",
+    "http_status",
+    "referrer",
+    "user_agent",
+)
 
-def ts_apache(s: str) -> datetime:
-    return datetime.strptime(s, "%d/%b/%Y:%H:%M:%S %z")
+Row = Tuple[Any, ...]
+
+# Files are read in blocks of whole lines of about this many characters,
+# and each block is matched with a single finditer call.
+READ_BLOCK_SIZE = 1 << 22
+
+# Large files are split into line-aligned ranges of about this many bytes,
+# each parsed and loaded by its own worker.
+PARSE_RANGE_SIZE = 1 << 28
+
+
+def line_regex(regex: re.Pattern) -> re.Pattern:
+    """
+    Derive a multi-line variant of a per-line pattern for block scans.
+
+    The pattern is anchored at line starts, and ``\s`` is narrowed so a
+    match can never run across a newline into the next line.
+    """
+    pattern = regex.pattern.replace(r"\s", r"[^\S\n]")
+    if not pattern.lstrip().startswith("^"):
+        pattern = "^" + pattern
+    return re.compile(pattern, regex.flags | re.MULTILINE)
+
+
+def split_ranges(path: str, range_size: int = PARSE_RANGE_SIZE) -> List[Tuple[int, int]]:
+    """
+    Split a file into byte ranges of about ``range_size`` that start and
+    end on line boundaries, so each range can be parsed independently.
+    """
+    size = os.path.getsize(path)
+    parts = max(1, -(-size // range_size))
+
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            f.seek(max(size * i // parts, bounds[-1]))
+            f.readline()
+            if f.tell() < size:
+                bounds.append(f.tell())
+    bounds.append(size)
+
+    return list(zip(bounds, bounds[1:]))
+
+
+def read_line_blocks(path: str, start: int = 0, end: Optional[int] = None):
+    """
+    Yield the byte range ``[start, end)`` of a file as blocks of complete
+    lines. ``start`` and ``end`` must fall on line boundaries.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = (os.path.getsize(path) if end is None else end) - start
+        tail = b""
+        while remaining > 0:
+            data = f.read(min(READ_BLOCK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            data = tail + data
+            cut = data.rfind(b"\n") + 1
+            if cut == 0:
+                tail = data
+                continue
+            tail = data[cut:]
+            yield _decode_block(data[:cut])
+        if tail:
+            yield _decode_block(tail + b"\n")
 
 
-def ts_hdfs_compact(date: str, time: str) -> datetime:
-    return datetime.strptime(date + time, "%y%m%d%H%M%S")
+def _decode_block(data: bytes) -> str:
+    # Same newline handling as reading the file in text mode.
+    text = data.decode()
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
 
 
-def make_row(
-    *,
-    log_type_name: str,
-    action_type_name: str,
-    log_timestamp: datetime,
-    source_ip: Optional[str],
-    dest_ip: Optional[str],
-    block_id: Optional[int],
-    size_bytes: Optional[int],
-    detail: Optional[Dict[str, Any]]
-) -> Dict[str, Any]:
-    return {
-        "log_type_name": log_type_name,
-        "action_type_name": action_type_name,
-        "log_timestamp": log_timestamp,
-        "source_ip": source_ip,
-        "dest_ip": dest_ip,
-        "block_id": block_id,
-        "size_bytes": size_bytes,
-        "detail": detail
-    }
+def parse_file(
+    path: str,
+    regex: re.Pattern,
+    row_builder: Callable[[Tuple[Optional[str], ...]], List[Row]],
+    start: int = 0,
+    end: Optional[int] = None,
+    debug_csv: bool = False,
+) -> Iterator[Row]:
+    rows = match_rows(path, regex, row_builder, start, end)
+    if debug_csv:
+        return write_rows_to_csv(path, start, rows)
+    return rows
 
 
-def parse_file(
+def match_rows(
     path: str,
     regex: re.Pattern,
-    row_builder: Callable[[Dict[str, str], int], List[Dict[str, Any]]]
-) -> List[Dict[str, Any]]:
-    tiny_logger(f"[parse_file] Starting: {path}")
-    rows = []
+    row_builder: Callable[[Tuple[Optional[str], ...]], List[Row]],
+    start: int,
+    end: Optional[int],
+) -> Iterator[Row]:
+    tiny_logger("[parse_file] Starting: %s [%d:%s]", path, start, end)
     total = 0
     matched = 0
 
-    with open(path) as f:
-        for line_no, raw in enumerate(f, 1):
-            total += 1
-            clean = raw.rstrip("\n")
-            m = regex.match(clean)
-
-            if not m:
-                continue
+    for block in read_line_blocks(path, start, end):
+        total += block.count("\n")
 
+        for m in regex.finditer(block):
             matched += 1
-            g = m.groupdict()
-            built_rows = row_builder(g, line_no)
-
-            for row in built_rows:
-                rows.append(
-                    make_row(
-                        log_type_name=row["log_type_name"],
-                        action_type_name=row["action_type_name"],
-                        log_timestamp=row["timestamp"],
-                        source_ip=row["source_ip"],
-                        dest_ip=row["dest_ip"],
-                        block_id=row["block_id"],
-                        size_bytes=row["size_bytes"],
-                        detail=row["detail"]
-                    )
-                )
-
-    tiny_logger(f"[parse_file] Finished {path}: matched {matched}/{total}")
+            yield from row_builder(m.groups())
 
-    return rows
+    tiny_logger(
+        "[parse_file] Finished %s [%d:%s]: matched %d/%d",
+        path, start, end, matched, total,
+    )
 
 
 ACCESS_REGEX = re.compile(
@@ -110,28 +182,32 @@ ACCESS_REGEX = re.compile(
 )
 
 
-def build_access(g: Dict[str, str], _: int) -> List[Dict[str, Any]]:
-    size = None if g["size"] == "-" else int(g["size"])
-    timestamp = ts_apache(g["timestamp"])
-
-    return [{
-        "log_type_name": "ACCESS",
-        "action_type_name": g["method"],
-        "timestamp": timestamp,
-        "source_ip": g["ip"],
-        "dest_ip": None,
-        "block_id": None,
-        "size_bytes": size,
-        "detail": {
-            "remote_name": g["remote_name"],
-            "auth_user": g["auth_user"],
-            "http_method": g["method"],
-            "resource": g["resource"],
-            "http_status": int(g["status"]),
-            "referrer": None if g["referrer"] == "-" else g["referrer"],
-            "user_agent": g["agent"]
-        }
-    }]
+# Builders take the match groups as a plain tuple and unpack them in
+# pattern order, so no per-match namedtuple or group-name lookup is needed.
+def build_access(groups: Tuple[Optional[str], ...]) -> List[Row]:
+    (ip, remote_name, auth_user, timestamp, method, resource,
+     status, size, referrer, agent) = groups
+
+    size = None if size == "-" else int(size)
+    timestamp = ts_apache(timestamp)
+
+    return [(
+        "ACCESS",
+        method,
+        timestamp,
+        ip,
+        None,
+        None,
+        size,
+        (
+            remote_name,
+            auth_user,
+            resource,
+            int(status),
+            None if referrer == "-" else referrer,
+            agent,
+        ),
+    )]
 
 
 DATAX_REGEX = re.compile(
@@ -167,178 +243,142 @@ DATAX_REGEX = re.compile(
 )
 
 
-def build_datax(g: Dict[str, str], _: int) -> List[Dict[str, Any]]:
-    timestamp = ts_hdfs_compact(g["date"], g["time"])
-
-    if g.get("op_receiving"):
-        return [{
-            "log_type_name": "HDFS_DATAXCEIVER",
-            "action_type_name": "receiving",
-            "timestamp": timestamp,
-            "source_ip": g["src_receiving"],
-            "dest_ip": g["dst_receiving"],
-            "block_id": int(g["blk_receiving"][4:]),
-            "size_bytes": None,
-            "detail": None
-        }]
-
-    if g.get("op_received"):
-        size = int(g["size_received"]) if g.get("size_received") else None
-        return [{
-            "log_type_name": "HDFS_DATAXCEIVER",
-            "action_type_name": "received",
-            "timestamp": timestamp,
-            "source_ip": g["src_received"],
-            "dest_ip": g["dst_received"],
-            "block_id": int(g["blk_received"][4:]),
-            "size_bytes": size,
-            "detail": None
-        }]
-
-    if g.get("op_served"):
-        return [{
-            "log_type_name": "HDFS_DATAXCEIVER",
-            "action_type_name": "served",
-            "timestamp": timestamp,
-            "source_ip": g["src_served"],
-            "dest_ip": g["dst_served"],
-            "block_id": int(g["blk_served"][4:]),
-            "size_bytes": None,
-            "detail": None
-        }]
+def build_datax(groups: Tuple[Optional[str], ...]) -> List[Row]:
+    (date, time, _,
+     op_receiving, blk_receiving, src_receiving, dst_receiving,
+     op_received, blk_received, src_received, dst_received, size_received,
+     src_served, op_served, blk_served, dst_served) = groups
+
+    timestamp = ts_hdfs_compact(date, time)
+
+    if op_receiving:
+        return [(
+            "HDFS_DATAXCEIVER",
+            "receiving",
+            timestamp,
+            parse_ip(src_receiving),
+            parse_ip(dst_receiving),
+            int(blk_receiving[4:]),
+            None,
+            None,
+        )]
+
+    if op_received:
+        size = int(size_received) if size_received else None
+        return [(
+            "HDFS_DATAXCEIVER",
+            "received",
+            timestamp,
+            parse_ip(src_received),
+            parse_ip(dst_received),
+            int(blk_received[4:]),
+            size,
+            None,
+        )]
+
+    if op_served:
+        return [(
+            "HDFS_DATAXCEIVER",
+            "served",
+            timestamp,
+            parse_ip(src_served),
+            parse_ip(dst_served),
+            int(blk_served[4:]),
+            None,
+            None,
+        )]
 
     return []
 
 
-NAMESYS_UPDATE_REGEX = re.compile(
+NAMESYS_REGEX = re.compile(
     r'''
     ^
     (?P<date>\d{6})\s+
     (?P<time>\d{6})\s+
     (?P<tid>\d+)\s+
     INFO\s+dfs\.FSNamesystem:\s+BLOCK\*\s+
-    NameSystem\.\w+:\s+
-    blockMap\s+updated:\s+
-    (?P<ip>[0-9.]+):\d+.*?
-    blk_(?P<block>-?\d+)
-    (?:\s+size\s+(?P<size>\d+))?
-    $
-    ''',
-    re.VERBOSE
-)
+    (?:
+        NameSystem\.\w+:\s+
+        blockMap\s+updated:\s+
+        (?P<upd_ip>[0-9.]+):\d+.*?
+        blk_(?P<upd_block>-?\d+)
+        (?:\s+size\s+(?P<upd_size>\d+))?
+        |
 
-NAMESYS_ASK_REPLICATE_REGEX = re.compile(
-    r'''
-    ^
-    (?P<date>\d{6})\s+
-    (?P<time>\d{6})\s+
-    (?P<tid>\d+)\s+
-    INFO\s+dfs\.FSNamesystem:\s+BLOCK\*\s+
-    ask\s+(?P<src_ip>[0-9.]+):\d+
-    \s+to\s+replicate\s+
-    blk_(?P<block>-?\d+)
-    \s+to\s+datanode\(s\)\s+
-    (?P<dest_list>(?:[0-9.]+:\d+\s*)+)
+        ask\s+(?P<rep_src_ip>[0-9.]+):\d+
+        \s+to\s+replicate\s+
+        blk_(?P<rep_block>-?\d+)
+        \s+to\s+datanode\(s\)\s+
+        (?P<rep_dest_list>(?:[0-9.]+:\d+\s*)+)
+    )
     $
     ''',
     re.VERBOSE
 )
 
 
-def build_namesystem_update(g: Dict[str, str], _: int) -> List[Dict[str, Any]]:
-    timestamp = ts_hdfs_compact(g["date"], g["time"])
-    size = int(g["size"]) if g.get("size") else None
-
-    return [{
-        "log_type_name": "HDFS_NAMESYSTEM",
-        "action_type_name": "update",
-        "timestamp": timestamp,
-        "source_ip": None,
-        "dest_ip": g.get("ip"),
-        "block_id": int(g["block"]),
-        "size_bytes": size,
-        "detail": None
-    }]
-
-
-def build_namesystem_replicate(g: Dict[str, str], _: int) -> List[Dict[str, Any]]:
-    timestamp = ts_hdfs_compact(g["date"], g["time"])
-    block_id = int(g["block"])
-    src_ip = g["src_ip"]
-
-    rows = []
-    for token in g["dest_list"].split():
-        ip = token.split(":")[0]
-        rows.append({
-            "log_type_name": "HDFS_NAMESYSTEM",
-            "action_type_name": "replicate",
-            "timestamp": timestamp,
-            "source_ip": src_ip,
-            "dest_ip": ip,
-            "block_id": block_id,
-            "size_bytes": None,
-            "detail": None
-        })
+def build_namesystem_update(timestamp, ip: str, block: str, size: Optional[str]) -> List[Row]:
+    return [(
+        "HDFS_NAMESYSTEM",
+        "update",
+        timestamp,
+        None,
+        parse_ip(ip),
+        int(block),
+        int(size) if size else None,
+        None,
+    )]
 
-    return rows
 
+def build_namesystem_replicate(timestamp, src_ip: str, block: str, dest_list: str) -> List[Row]:
+    block_id = int(block)
+    src_ip = parse_ip(src_ip)
 
-def parse_namesystem(path: str) -> List[Dict[str, Any]]:
-    tiny_logger(f"[parse_namesystem] Starting: {path}")
-    rows = []
-    total = 0
-    matched = 0
+    # The dest list is whitespace-separated ip:port tokens.
+    return [
+        (
+            "HDFS_NAMESYSTEM",
+            "replicate",
+            timestamp,
+            src_ip,
+            parse_ip(token.partition(":")[0]),
+            block_id,
+            None,
+            None,
+        )
+        for token in dest_list.split()
+    ]
 
-    with open(path) as f:
-        for line_no, raw in enumerate(f, 1):
-            total += 1
-            clean = raw.rstrip("\n")
-
-            m_upd = NAMESYS_UPDATE_REGEX.match(clean)
-            if m_upd:
-                for r in build_namesystem_update(m_upd.groupdict(), line_no):
-                    rows.append(
-                        make_row(
-                            log_type_name=r["log_type_name"],
-                            action_type_name=r["action_type_name"],
-                            log_timestamp=r["timestamp"],
-                            source_ip=r["source_ip"],
-                            dest_ip=r["dest_ip"],
-                            block_id=r["block_id"],
-                            size_bytes=r["size_bytes"],
-                            detail=r["detail"]
-                        )
-                    )
-                matched += 1
-                continue
 
-            m_rep = NAMESYS_ASK_REPLICATE_REGEX.match(clean)
-            if m_rep:
-                built = build_namesystem_replicate(m_rep.groupdict(), line_no)
-                for r in built:
-                    rows.append(
-                        make_row(
-                            log_type_name=r["log_type_name"],
-                            action_type_name=r["action_type_name"],
-                            log_timestamp=r["timestamp"],
-                            source_ip=r["source_ip"],
-                            dest_ip=r["dest_ip"],
-                            block_id=r["block_id"],
-                            size_bytes=r["size_bytes"],
-                            detail=r["detail"]
-                        )
-                    )
-                matched += 1
-
-    tiny_logger(f"[parse_namesystem] Finished {path}: matched {matched}/{total}")
+def build_namesystem(groups: Tuple[Optional[str], ...]) -> List[Row]:
+    (date, time, _, upd_ip, upd_block, upd_size,
+     rep_src_ip, rep_block, rep_dest_list) = groups
+
+    timestamp = ts_hdfs_compact(date, time)
+    if upd_block is not None:
+        return build_namesystem_update(timestamp, upd_ip, upd_block, upd_size)
+    return build_namesystem_replicate(timestamp, rep_src_ip, rep_block, rep_dest_list)
+
+
+ACCESS_LINE_REGEX = line_regex(ACCESS_REGEX)
+DATAX_LINE_REGEX = line_regex(DATAX_REGEX)
+NAMESYS_LINE_REGEX = line_regex(NAMESYS_REGEX)
 
-    return rows
 
+def parse_namesystem(
+    path: str, start: int = 0, end: Optional[int] = None, debug_csv: bool = False
+) -> Iterator[Row]:
+    return parse_file(path, NAMESYS_LINE_REGEX, build_namesystem, start, end, debug_csv)
 
-def parse_access(path: str) -> List[Dict[str, Any]]:
-    return parse_file(path, ACCESS_REGEX, build_access)
 
+def parse_access(
+    path: str, start: int = 0, end: Optional[int] = None, debug_csv: bool = False
+) -> Iterator[Row]:
+    return parse_file(path, ACCESS_LINE_REGEX, build_access, start, end, debug_csv)
 
-def parse_dataxceiver(path: str) -> List[Dict[str, Any]]:
-    return parse_file(path, DATAX_REGEX, build_datax)
 
+def parse_dataxceiver(
+    path: str, start: int = 0, end: Optional[int] = None, debug_csv: bool = False
+) -> Iterator[Row]:
+    return parse_file(path, DATAX_LINE_REGEX, build_datax, start, end, debug_csv)
@@ -13,6 +13,7 @@ ENTRY_FIELDS = [
     "id",
     "log_type_id",
     "action_type_id",
+    "action_type_name",
     "log_timestamp",
     "source_ip",
     "dest_ip",
@@ -30,4 +31,26 @@ ACCESS_DETAIL_FIELDS = [
     "user_agent",
 ]
 
+# Aggregates over log_entry / log_access_detail (see db/init.sql), rebuilt
+# after every load. Both the COPY loader and the archived batch loader
+# refresh exactly this list, so a new mv_* view is added here only.
+MATERIALIZED_VIEWS = [
+    "mv_logs_per_action_type_hour",
+    "mv_block_actions_per_day",
+    "mv_referrers_multiple_resources",
+    "mv_second_most_common_resource",
+    "mv_blocks_rep_and_serv_same_day",
+    "mv_blocks_rep_and_serv_same_day_hour",
+]
+
+# Upper bound on the archived batch loader's worker processes. Each worker
+# holds two connections (its COPY transaction plus an autocommit one for
+# action types), so this keeps a large host well under Postgres' default
+# max_connections of 100.
+MAX_LOAD_WORKERS = 16
+
+# Read buffer for the raw log files; far larger than the default so the
+# workers' line loops refill it rarely.
+INPUT_BUFFER_SIZE = 1 << 20
+
 ACTION_TYPE_NAMESPACE = uuid.UUID("12345678-1234-5678-1234-567812345678")
@@ -1,4 +1,5 @@
 import uuid
+from functools import lru_cache
 from typing import Dict
 
 from util import LogType
@@ -21,6 +22,7 @@ def load_log_type_ids() -> Dict[LogType, int]:
     return log_type_ids
 
 
+@lru_cache(maxsize=None)
 def deterministic_action_type_id(action: str) -> str:
     """
     Compute a deterministic UUID for an action type.
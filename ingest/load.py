@@ -19,6 +19,7 @@ import psycopg
 from psycopg import Connection
 
 from util import tiny_logger
+from config import MATERIALIZED_VIEWS
 
 
 CSV_DIR = "./parsed"
@@ -28,6 +29,16 @@ ACTION_TYPE_CSV = os.path.join(CSV_DIR, "action_type.csv")
 LOG_ENTRY_CSV = os.path.join(CSV_DIR, "log_entry.csv")
 ACCESS_DETAIL_CSV = os.path.join(CSV_DIR, "log_access_detail.csv")
 
+# Session settings for the bulk load. The data can be fully regenerated
+# from the raw logs, so waiting for the WAL flush on every commit buys nothing.
+INGEST_SESSION_SETTINGS = [
+    "SET synchronous_commit = off",
+    "SET maintenance_work_mem = '256MB'",
+]
+
+# Tables that are emptied and bulk loaded on every run.
+BULK_TABLES = ["log_entry", "log_access_detail"]
+
 
 def copy_csv(
     conn: Connection,
@@ -38,6 +49,9 @@ def copy_csv(
     """
     Load a CSV file into a PostgreSQL table using COPY.
 
+    The COPY runs in the caller's transaction; committing is left to the
+    caller so all tables can be loaded under a single commit.
+
     :param conn: psycopg connection.
     :param table: Target PostgreSQL table name.
     :param csv_path: Path to the CSV file.
@@ -61,7 +75,6 @@ def copy_csv(
             cp.write(infile.read())
         rowcount = cur.rowcount
 
-    conn.commit()
     return rowcount
 
 
@@ -69,11 +82,16 @@ def truncate_all(conn: Connection) -> None:
     """
     Truncate all target tables and reset identity sequences.
 
+    The ingest session settings are sent in the same pipeline, so the
+    whole preparation step costs a single round-trip.
+
     :param conn: psycopg connection.
     :return: None
     """
     tiny_logger("Truncating all target tables...")
-    with conn.cursor() as cur:
+    with conn.cursor() as cur, conn.pipeline():
+        for stmt in INGEST_SESSION_SETTINGS:
+            cur.execute(stmt)
         cur.execute(
             "TRUNCATE log_access_detail, log_entry, "
             "log_type, action_type RESTART IDENTITY;"
@@ -82,17 +100,110 @@ def truncate_all(conn: Connection) -> None:
     tiny_logger("Truncate complete.\n")
 
 
+def set_autovacuum(conn: Connection, enabled: bool) -> None:
+    """
+    Toggle autovacuum on the bulk loaded tables.
+
+    Autovacuum is switched off while the tables are refilled, so no worker
+    scans them half-way through the load. Re-enabling it runs a single
+    ANALYZE over the finished data instead.
+
+    :param conn: psycopg connection.
+    :param enabled: Whether autovacuum should be enabled.
+    :return: None
+    """
+    flag = "true" if enabled else "false"
+    with conn.cursor() as cur, conn.pipeline():
+        for table in BULK_TABLES:
+            cur.execute(
+                f"ALTER TABLE {table} SET ("
+                f"autovacuum_enabled = {flag}, "
+                f"toast.autovacuum_enabled = {flag})"
+            )
+        if enabled:
+            cur.execute(f"ANALYZE {', '.join(BULK_TABLES)}")
+    conn.commit()
+
+
+def drop_secondary_indexes(conn: Connection) -> List[str]:
+    """
+    Drop the indexes on the bulk loaded tables that back no constraint.
+
+    Building each index once over the loaded rows is much cheaper than
+    updating it for every copied row. Primary key, unique and similar
+    constraint indexes are kept, so foreign keys still resolve during
+    the load. Runs in the caller's transaction, so a failed load rolls
+    the drops back too.
+
+    :param conn: psycopg connection.
+    :return: ``CREATE INDEX`` statements recreating the dropped indexes.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT i.indexrelid::regclass::text, "
+            "pg_get_indexdef(i.indexrelid) "
+            "FROM pg_index i "
+            "WHERE i.indrelid = ANY(%s::regclass[]) "
+            "AND NOT EXISTS ("
+            "SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid"
+            ")",
+            (BULK_TABLES,),
+        )
+        indexes = cur.fetchall()
+
+        for name, _ in indexes:
+            cur.execute(f"DROP INDEX {name}")
+
+    tiny_logger(f"Dropped {len(indexes)} secondary indexes for the load.")
+    return [definition for _, definition in indexes]
+
+
+def create_indexes(conn: Connection, definitions: List[str]) -> None:
+    """
+    Recreate the indexes dropped by ``drop_secondary_indexes``.
+
+    :param conn: psycopg connection.
+    :param definitions: ``CREATE INDEX`` statements to run.
+    :return: None
+    """
+    with conn.cursor() as cur:
+        for definition in definitions:
+            tiny_logger(definition)
+            cur.execute(definition)
+
+
+def refresh_materialized_views(conn: Connection) -> None:
+    """
+    Refresh the materialized views built on the loaded tables.
+
+    CONCURRENTLY keeps the previous contents readable by the UI while
+    each view is rebuilt.
+
+    :param conn: psycopg connection.
+    :return: None
+    """
+    with conn.cursor() as cur:
+        for view in MATERIALIZED_VIEWS:
+            tiny_logger(f"Refreshing {view}...")
+            cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}")
+            conn.commit()
+
+
 def main() -> None:
     """
     Execute the ingestion pipeline.
 
     Steps:
       1. Connect to PostgreSQL.
-      2. Truncate tables.
-      3. COPY log_type.
-      4. COPY action_type.
-      5. COPY log_entry.
-      6. COPY log_access_detail.
+      2. Truncate tables and pause autovacuum on them.
+      3. Drop the secondary indexes of log_entry / log_access_detail.
+      4. COPY log_type.
+      5. COPY action_type.
+      6. COPY log_entry.
+      7. COPY log_access_detail.
+      8. Rebuild the dropped indexes, then commit everything at once.
+      9. Re-enable autovacuum and analyze the loaded tables.
+      10. Refresh the materialized views.
 
     Connection parameters are obtained from environment variables.
     """
@@ -108,6 +219,9 @@ def main() -> None:
 
     try:
         truncate_all(conn)
+        set_autovacuum(conn, False)
+
+        index_definitions = drop_secondary_indexes(conn)
 
         copy_csv(conn, "log_type", LOG_TYPE_CSV, ["id", "name"])
         copy_csv(conn, "action_type", ACTION_TYPE_CSV, ["id", "name"])
@@ -120,6 +234,7 @@ def main() -> None:
                 "id",
                 "log_type_id",
                 "action_type_id",
+                "action_type_name",
                 "log_timestamp",
                 "source_ip",
                 "dest_ip",
@@ -143,6 +258,12 @@ def main() -> None:
             ],
         )
 
+        create_indexes(conn, index_definitions)
+        conn.commit()
+
+        set_autovacuum(conn, True)
+        refresh_materialized_views(conn)
+
         tiny_logger("== DONE ==")
         tiny_logger("All tables loaded successfully.")
 
@@ -1,4 +1,26 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+MONTHS = {
+    name: number
+    for number, name in enumerate(
+        ("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+         "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"),
+        start=1,
+    )
+}
+
+
+@lru_cache(maxsize=None)
+def utc_offset(s: str) -> timezone:
+    """
+    Build the ``timezone`` for a ``±HHMM`` offset, once per distinct offset.
+
+    :param s: Offset string such as ``+0100``.
+    :return: Matching fixed-offset ``timezone``.
+    """
+    offset = timedelta(hours=int(s[1:3]), minutes=int(s[3:5]))
+    return timezone(-offset if s[0] == "-" else offset)
 
 
 def ts_apache(s: str) -> datetime:
@@ -10,7 +32,16 @@ def ts_apache(s: str) -> datetime:
     :param s: Timestamp string from an Apache access log.
     :return: Parsed ``datetime`` object with timezone info.
     """
-    return datetime.strptime(s, "%d/%b/%Y:%H:%M:%S %z")
+    # Apache always writes this fixed 26-character layout, so the fields
+    # are sliced directly; anything else goes through strptime.
+    month = MONTHS.get(s[3:6])
+    if len(s) != 26 or month is None:
+        return datetime.strptime(s, "%d/%b/%Y:%H:%M:%S %z")
+    return datetime(
+        int(s[7:11]), month, int(s[0:2]),
+        int(s[12:14]), int(s[15:17]), int(s[18:20]),
+        tzinfo=utc_offset(s[21:26]),
+    )
 
 
 def ts_hdfs_compact(date: str, time: str) -> datetime:
@@ -24,4 +55,12 @@ def ts_hdfs_compact(date: str, time: str) -> datetime:
     :param time: Time string in compact HDFS format.
     :return: Parsed ``datetime`` object (naive, UTC assumed external).
     """
-    return datetime.strptime(date + time, "%y%m%d%H%M%S")
+    # Both fields are fixed-width digits (the worker regexes guarantee it),
+    # so slicing them is far cheaper than strptime's format interpreter.
+    # Two-digit years follow strptime's %y pivot.
+    year = int(date[0:2])
+    year += 2000 if year < 69 else 1900
+    return datetime(
+        year, int(date[2:4]), int(date[4:6]),
+        int(time[0:2]), int(time[2:4]), int(time[4:6]),
+    )
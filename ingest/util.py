@@ -1,4 +1,7 @@
 #!/usr/bin/env python3
+import os
+import re
+from collections import namedtuple
 from datetime import datetime, timezone
 from enum import Enum
 from typing import List
@@ -40,15 +43,57 @@ class LogType(str, Enum):
         return list(cls)
 
 
-def tiny_logger(msg: str) -> None:
+def match_fields(typename: str, regex: re.Pattern) -> type:
+    """
+    Build a namedtuple type whose fields are the named groups of ``regex``.
+
+    The fields follow group order, so ``Fields._make(match.groups())``
+    gives attribute access to a match without building a ``groupdict()``
+    per line. Every capturing group in ``regex`` must be named.
+
+    :param typename: Name of the generated namedtuple class.
+    :param regex: Compiled pattern to derive the fields from.
+    :return: The namedtuple class.
+    """
+    names = sorted(regex.groupindex, key=regex.groupindex.get)
+    if len(names) != regex.groups:
+        raise ValueError(f"{typename}: every capturing group must be named")
+    return namedtuple(typename, names)
+
+
+DEBUG_ENABLED = os.getenv("LOGDB_DEBUG") == "1"
+
+
+def tiny_logger(msg: str, *args) -> None:
     """
     Print a timestamped log message in UTC.
 
     Format example:
         2025-11-26 15:23:11.492 | message
 
+    Positional ``args`` are merged into ``msg`` with ``%``-formatting,
+    so callers can pass values instead of pre-formatted strings.
+
     :param msg: The message to output.
+    :param args: Optional ``%``-style formatting arguments.
     :return: None
     """
+    if args:
+        msg = msg % args
     ts = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
     print(f"{ts} | {msg}", flush=True)
+
+
+def tiny_debug(msg: str, *args) -> None:
+    """
+    Print a debug message only when ``LOGDB_DEBUG=1`` is set.
+
+    The message is formatted lazily, so disabled debug calls cost a
+    single flag check.
+
+    :param msg: The message to output.
+    :param args: Optional ``%``-style formatting arguments.
+    :return: None
+    """
+    if DEBUG_ENABLED:
+        tiny_logger(msg, *args)
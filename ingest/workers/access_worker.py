@@ -1,12 +1,12 @@
 import csv
 import re
-from typing import Dict, Set, Any
+from typing import Set
 
 from timestamps import ts_apache
 from writers import write_entry
 from ids import load_log_type_ids, deterministic_action_type_id
-from config import ENTRY_FIELDS, ACCESS_DETAIL_FIELDS
-from util import LogType
+from config import ENTRY_FIELDS, ACCESS_DETAIL_FIELDS, INPUT_BUFFER_SIZE
+from util import LogType, match_fields
 
 ACCESS_REGEX = re.compile(
     r'(?P<ip>\S+)\s+'
@@ -20,6 +20,12 @@ ACCESS_REGEX = re.compile(
     r'"(?P<agent>[^"]*)"'
 )
 
+AccessFields = match_fields("AccessFields", ACCESS_REGEX)
+
+# Literal every ACCESS line contains; lines without it are skipped before
+# the regex engine is invoked.
+ACCESS_PREFILTER = '"'
+
 
 def parse_access_worker(
     input_path: str,
@@ -52,29 +58,34 @@ def parse_access_worker(
         writer_detail = csv.DictWriter(detail_csv, fieldnames=ACCESS_DETAIL_FIELDS)
         writer_detail.writeheader()
 
-        with open(input_path, encoding="utf-8") as infile:
+        with open(
+            input_path, encoding="utf-8", buffering=INPUT_BUFFER_SIZE
+        ) as infile:
             for raw_line in infile:
+                if ACCESS_PREFILTER not in raw_line:
+                    continue
+
                 line = raw_line.rstrip("\n")
                 match = ACCESS_REGEX.match(line)
                 if not match:
                     continue
 
-                fields: Dict[str, Any] = match.groupdict()
-                timestamp = ts_apache(fields["timestamp"])
+                fields = AccessFields._make(match.groups())
+                timestamp = ts_apache(fields.timestamp)
 
-                action = fields["method"]
+                action = fields.method
                 action_type_names.add(action)
 
                 size_bytes = (
-                    int(fields["size"]) if fields["size"] not in {"", "-"} else ""
+                    int(fields.size) if fields.size not in {"", "-"} else ""
                 )
 
                 entry_id = write_entry(
                     writer_entry,
                     LogType.ACCESS,
-                    deterministic_action_type_id(action),
+                    action,
                     timestamp,
-                    fields["ip"],
+                    fields.ip,
                     "",
                     "",
                     size_bytes,
@@ -84,14 +95,14 @@ def parse_access_worker(
 
                 writer_detail.writerow({
                     "log_entry_id": entry_id,
-                    "remote_name": fields["remote_name"],
-                    "auth_user": fields["auth_user"],
-                    "resource": fields["resource"],
-                    "http_status": int(fields["status"]),
+                    "remote_name": fields.remote_name,
+                    "auth_user": fields.auth_user,
+                    "resource": fields.resource,
+                    "http_status": int(fields.status),
                     "referrer": (
-                        None if fields["referrer"] == "-" else fields["referrer"]
+                        None if fields.referrer == "-" else fields.referrer
                     ),
-                    "user_agent": fields["agent"],
+                    "user_agent": fields.agent,
                 })
 
     write_action_types(tmp_detail_path, action_type_names)
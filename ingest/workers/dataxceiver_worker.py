@@ -1,39 +1,51 @@
 import csv
 import re
-from typing import Dict, Set, Any
+from typing import Dict, Set
 
 from timestamps import ts_hdfs_compact
 from ids import load_log_type_ids, deterministic_action_type_id
 from writers import write_entry
-from config import ENTRY_FIELDS
-from util import LogType
-
-DATAX_REGEX = re.compile(
-    r'''
-    ^(?P<date>\d{6})\s+
-    (?P<time>\d{6})\s+
-    (?P<tid>\d+)\s+
-    INFO\s+dfs\.DataNode\$DataXceiver:\s+
-    (?:
-        (?P<op_receiving>Receiving)\s+block\s+
-        (?P<blk_receiving>blk_[0-9\-]+)
-        \s+src:\s+/(?P<src_receiving>[0-9.]+):\d+
-        \s+dest:\s+/(?P<dst_receiving>[0-9.]+):\d+
-        |
-        (?P<op_received>Received)\s+block\s+
-        (?P<blk_received>blk_[0-9\-]+)
-        .*?src:\s+/(?P<src_received>[0-9.]+):\d+
-        \s+dest:\s+/(?P<dst_received>[0-9.]+):\d+
-        (?:.*?size\s+(?P<size_received>\d+))?
-        |
-        (?P<src_served>[0-9.]+):\d+\s+
-        (?P<op_served>Served)\s+block\s+
-        (?P<blk_served>blk_[0-9\-]+)
-        \s+to\s+/(?P<dst_served>[0-9.]+)
-    )$''',
-    re.VERBOSE,
+from config import ENTRY_FIELDS, INPUT_BUFFER_SIZE
+from util import LogType, match_fields
+
+# Timestamp/thread/logger prefix shared by every DataXceiver line.
+DATAX_PREFIX = (
+    r'^(?P<date>\d{6})\s+(?P<time>\d{6})\s+\d+\s+'
+    r'INFO\s+dfs\.DataNode\$DataXceiver:\s+'
+)
+
+# One pattern per operation instead of a single alternation: a line is
+# only matched against the pattern whose keyword it contains, and each
+# pattern has just the handful of groups its operation needs.
+DATAX_RECEIVING_REGEX = re.compile(
+    DATAX_PREFIX +
+    r'Receiving\s+block\s+(?P<block>blk_[0-9\-]+)'
+    r'\s+src:\s+/(?P<src>[0-9.]+):\d+'
+    r'\s+dest:\s+/(?P<dst>[0-9.]+):\d+$'
+)
+
+DATAX_RECEIVED_REGEX = re.compile(
+    DATAX_PREFIX +
+    r'Received\s+block\s+(?P<block>blk_[0-9\-]+)'
+    r'.*?src:\s+/(?P<src>[0-9.]+):\d+'
+    r'\s+dest:\s+/(?P<dst>[0-9.]+):\d+'
+    r'(?:.*?size\s+(?P<size>\d+))?$'
 )
 
+DATAX_SERVED_REGEX = re.compile(
+    DATAX_PREFIX +
+    r'(?P<src>[0-9.]+):\d+\s+Served\s+block\s+(?P<block>blk_[0-9\-]+)'
+    r'\s+to\s+/(?P<dst>[0-9.]+)$'
+)
+
+ReceivingFields = match_fields("ReceivingFields", DATAX_RECEIVING_REGEX)
+ReceivedFields = match_fields("ReceivedFields", DATAX_RECEIVED_REGEX)
+ServedFields = match_fields("ServedFields", DATAX_SERVED_REGEX)
+
+# Literal every DataXceiver line contains; lines without it are skipped
+# before the regex engine is invoked.
+DATAX_PREFILTER = "DataXceiver"
+
 
 def parse_dataxceiver_worker(input_path: str, tmp_entry_path: str) -> None:
     """
@@ -51,52 +63,53 @@ def parse_dataxceiver_worker(input_path: str, tmp_entry_path: str) -> None:
         writer_entry = csv.DictWriter(entry_csv, fieldnames=ENTRY_FIELDS)
         writer_entry.writeheader()
 
-        with open(input_path, encoding="utf-8") as infile:
+        with open(
+            input_path, encoding="utf-8", buffering=INPUT_BUFFER_SIZE
+        ) as infile:
             for raw_line in infile:
-                line = raw_line.rstrip("\n")
-                match = DATAX_REGEX.match(line)
-                if not match:
-                    continue
-
-                fields: Dict[str, Any] = match.groupdict()
-                timestamp = ts_hdfs_compact(fields["date"], fields["time"])
-
-                if fields.get("op_receiving"):
-                    add_receiving(
-                        writer_entry,
-                        fields,
-                        timestamp,
-                        log_type_ids,
-                        action_type_names,
-                    )
+                if DATAX_PREFILTER not in raw_line:
                     continue
 
-                if fields.get("op_received"):
-                    add_received(
-                        writer_entry,
-                        fields,
-                        timestamp,
-                        log_type_ids,
-                        action_type_names,
-                    )
-                    continue
+                line = raw_line.rstrip("\n")
 
-                if fields.get("op_served"):
-                    add_served(
-                        writer_entry,
-                        fields,
-                        timestamp,
-                        log_type_ids,
-                        action_type_names,
-                    )
+                if "Receiving" in line:
+                    match = DATAX_RECEIVING_REGEX.match(line)
+                    if match:
+                        add_receiving(
+                            writer_entry,
+                            ReceivingFields._make(match.groups()),
+                            log_type_ids,
+                            action_type_names,
+                        )
+                        continue
+
+                if "Received" in line:
+                    match = DATAX_RECEIVED_REGEX.match(line)
+                    if match:
+                        add_received(
+                            writer_entry,
+                            ReceivedFields._make(match.groups()),
+                            log_type_ids,
+                            action_type_names,
+                        )
+                        continue
+
+                if "Served" in line:
+                    match = DATAX_SERVED_REGEX.match(line)
+                    if match:
+                        add_served(
+                            writer_entry,
+                            ServedFields._make(match.groups()),
+                            log_type_ids,
+                            action_type_names,
+                        )
 
     write_action_types(tmp_entry_path, action_type_names)
 
 
 def add_receiving(
     writer_entry: csv.DictWriter,
-    fields: Dict[str, Any],
-    timestamp,
+    fields: ReceivingFields,
     log_type_ids: Dict[LogType, int],
     action_type_names: Set[str],
 ) -> None:
@@ -104,8 +117,7 @@ def add_receiving(
     Write a ``receiving`` log_entry row.
 
     :param writer_entry: CSV DictWriter for log_entry rows.
-    :param fields: Matched regex field dictionary.
-    :param timestamp: Parsed timestamp object.
+    :param fields: Matched regex fields.
     :param log_type_ids: Mapping of LogType to numeric IDs.
     :param action_type_names: Set collecting unique action names.
     :return: None
@@ -113,14 +125,16 @@ def add_receiving(
     action = "receiving"
     action_type_names.add(action)
 
+    timestamp = ts_hdfs_compact(fields.date, fields.time)
+
     write_entry(
         writer_entry,
         LogType.HDFS_DATAXCEIVER,
-        deterministic_action_type_id(action),
+        action,
         timestamp,
-        fields["src_receiving"],
-        fields["dst_receiving"],
-        int(fields["blk_receiving"].replace("blk_", "")),
+        fields.src,
+        fields.dst,
+        int(fields.block.replace("blk_", "")),
         "",
         {},
         log_type_ids,
@@ -129,8 +143,7 @@ def add_receiving(
 
 def add_received(
     writer_entry: csv.DictWriter,
-    fields: Dict[str, Any],
-    timestamp,
+    fields: ReceivedFields,
     log_type_ids: Dict[LogType, int],
     action_type_names: Set[str],
 ) -> None:
@@ -138,8 +151,7 @@ def add_received(
     Write a ``received`` log_entry row.
 
     :param writer_entry: CSV DictWriter for log_entry rows.
-    :param fields: Matched regex field dictionary.
-    :param timestamp: Parsed timestamp object.
+    :param fields: Matched regex fields.
     :param log_type_ids: Mapping of LogType to numeric IDs.
     :param action_type_names: Set collecting unique action names.
     :return: None
@@ -147,16 +159,18 @@ def add_received(
     action = "received"
     action_type_names.add(action)
 
-    size_value = int(fields["size_received"]) if fields["size_received"] else ""
+    timestamp = ts_hdfs_compact(fields.date, fields.time)
+
+    size_value = int(fields.size) if fields.size else ""
 
     write_entry(
         writer_entry,
         LogType.HDFS_DATAXCEIVER,
-        deterministic_action_type_id(action),
+        action,
         timestamp,
-        fields["src_received"],
-        fields["dst_received"],
-        int(fields["blk_received"].replace("blk_", "")),
+        fields.src,
+        fields.dst,
+        int(fields.block.replace("blk_", "")),
         size_value,
         {},
         log_type_ids,
@@ -165,8 +179,7 @@ def add_received(
 
 def add_served(
     writer_entry: csv.DictWriter,
-    fields: Dict[str, Any],
-    timestamp,
+    fields: ServedFields,
     log_type_ids: Dict[LogType, int],
     action_type_names: Set[str],
 ) -> None:
@@ -174,8 +187,7 @@ def add_served(
     Write a ``served`` log_entry row.
 
     :param writer_entry: CSV DictWriter for log_entry rows.
-    :param fields: Matched regex field dictionary.
-    :param timestamp: Parsed timestamp object.
+    :param fields: Matched regex fields.
     :param log_type_ids: Mapping of LogType to numeric IDs.
     :param action_type_names: Set collecting unique action names.
     :return: None
@@ -183,14 +195,16 @@ def add_served(
     action = "served"
     action_type_names.add(action)
 
+    timestamp = ts_hdfs_compact(fields.date, fields.time)
+
     write_entry(
         writer_entry,
         LogType.HDFS_DATAXCEIVER,
-        deterministic_action_type_id(action),
+        action,
         timestamp,
-        fields["src_served"],
-        fields["dst_served"],
-        int(fields["blk_served"].replace("blk_", "")),
+        fields.src,
+        fields.dst,
+        int(fields.block.replace("blk_", "")),
         "",
         {},
         log_type_ids,
@@ -1,42 +1,42 @@
 import csv
 import re
-from typing import Dict, Set, Any
+from typing import Dict, Set
 
 from timestamps import ts_hdfs_compact
 from ids import load_log_type_ids, deterministic_action_type_id
 from writers import write_entry
-from config import ENTRY_FIELDS
-from util import LogType
+from config import ENTRY_FIELDS, INPUT_BUFFER_SIZE
+from util import LogType, match_fields
 
-NAMESYS_UPDATE_REGEX = re.compile(
+# Update and replicate lines share the whole timestamp/thread/logger prefix,
+# so both are matched by one pattern and told apart by the group that fired.
+NAMESYS_REGEX = re.compile(
     r'''
     ^(?P<date>\d{6})\s+
     (?P<time>\d{6})\s+
     (?P<tid>\d+)\s+
     INFO\s+dfs\.FSNamesystem:\s+BLOCK\*\s+
-    NameSystem\.\w+:\s+
-    blockMap updated:\s+
-    (?P<ip>[0-9.]+):\d+.*?
-    blk_(?P<block>-?\d+)
-    (?:\s+size\s+(?P<size>\d+))?
-    $''',
+    (?:
+        NameSystem\.\w+:\s+
+        blockMap\s+updated:\s+
+        (?P<upd_ip>[0-9.]+):\d+.*?
+        blk_(?P<upd_block>-?\d+)
+        (?:\s+size\s+(?P<upd_size>\d+))?
+        |
+        ask\s+(?P<rep_src_ip>[0-9.]+):\d+
+        \s+to\s+replicate\s+
+        blk_(?P<rep_block>-?\d+)
+        \s+to\s+datanode\(s\)\s+
+        (?P<rep_dest_list>(?:[0-9.]+:\d+\s*)+)
+    )$''',
     re.VERBOSE,
 )
 
-NAMESYS_ASK_REPLICATE_REGEX = re.compile(
-    r'''
-    ^(?P<date>\d{6})\s+
-    (?P<time>\d{6})\s+
-    (?P<tid>\d+)\s+
-    INFO\s+dfs\.FSNamesystem:\s+BLOCK\*\s+
-    ask\s+(?P<src_ip>[0-9.]+):\d+
-    \s+to\s+replicate\s+
-    blk_(?P<block>-?\d+)
-    \s+to\s+datanode\(s\)\s+
-    (?P<dest_list>(?:[0-9.]+:\d+\s*)+)
-    $''',
-    re.VERBOSE,
-)
+NamesysFields = match_fields("NamesysFields", NAMESYS_REGEX)
+
+# Literal every FSNamesystem line contains; lines without it are skipped
+# before the regex engine is invoked.
+NAMESYS_PREFILTER = "FSNamesystem"
 
 
 def parse_namesystem_worker(
@@ -61,35 +61,43 @@ def parse_namesystem_worker(
         writer_entry = csv.DictWriter(entry_csv, fieldnames=ENTRY_FIELDS)
         writer_entry.writeheader()
 
-        with open(input_path, encoding="utf-8") as infile:
+        with open(
+            input_path, encoding="utf-8", buffering=INPUT_BUFFER_SIZE
+        ) as infile:
             for raw_line in infile:
+                if NAMESYS_PREFILTER not in raw_line:
+                    continue
+
                 line = raw_line.rstrip("\n")
 
-                match_update = NAMESYS_UPDATE_REGEX.match(line)
-                if match_update:
+                match = NAMESYS_REGEX.match(line)
+                if not match:
+                    continue
+
+                fields = NamesysFields._make(match.groups())
+
+                if fields.upd_block is not None:
                     add_update(
                         writer_entry,
-                        match_update.groupdict(),
+                        fields,
                         log_type_ids,
                         action_type_names,
                     )
                     continue
 
-                match_repl = NAMESYS_ASK_REPLICATE_REGEX.match(line)
-                if match_repl:
-                    add_replicate(
-                        writer_entry,
-                        match_repl.groupdict(),
-                        log_type_ids,
-                        action_type_names,
-                    )
+                add_replicate(
+                    writer_entry,
+                    fields,
+                    log_type_ids,
+                    action_type_names,
+                )
 
     write_action_types(tmp_entry_path, action_type_names)
 
 
 def add_update(
     writer_entry: csv.DictWriter,
-    fields: Dict[str, Any],
+    fields: NamesysFields,
     log_type_ids: Dict[LogType, int],
     action_type_names: Set[str],
 ) -> None:
@@ -97,7 +105,7 @@ def add_update(
     Write an ``update`` log_entry row.
 
     :param writer_entry: CSV DictWriter for log_entry rows.
-    :param fields: Matched regex field dictionary.
+    :param fields: Matched regex fields.
     :param log_type_ids: Mapping of LogType to numeric IDs.
     :param action_type_names: Set collecting unique actions.
     :return: None
@@ -105,17 +113,17 @@ def add_update(
     action = "update"
     action_type_names.add(action)
 
-    timestamp = ts_hdfs_compact(fields["date"], fields["time"])
-    size_value = int(fields["size"]) if fields.get("size") else ""
+    timestamp = ts_hdfs_compact(fields.date, fields.time)
+    size_value = int(fields.upd_size) if fields.upd_size else ""
 
     write_entry(
         writer_entry,
         LogType.HDFS_NAMESYSTEM,
-        deterministic_action_type_id(action),
+        action,
         timestamp,
-        fields["ip"],
+        fields.upd_ip,
         "",
-        int(fields["block"]),
+        int(fields.upd_block),
         size_value,
         {},
         log_type_ids,
@@ -124,7 +132,7 @@ def add_update(
 
 def add_replicate(
     writer_entry: csv.DictWriter,
-    fields: Dict[str, Any],
+    fields: NamesysFields,
     log_type_ids: Dict[LogType, int],
     action_type_names: Set[str],
 ) -> None:
@@ -133,7 +141,7 @@ def add_replicate(
     one per destination datanode.
 
     :param writer_entry: CSV DictWriter for log_entry rows.
-    :param fields: Matched regex field dictionary.
+    :param fields: Matched regex fields.
     :param log_type_ids: Mapping of LogType to numeric IDs.
     :param action_type_names: Set collecting unique actions.
     :return: None
@@ -141,20 +149,18 @@ def add_replicate(
     action = "replicate"
     action_type_names.add(action)
 
-    timestamp = ts_hdfs_compact(fields["date"], fields["time"])
-    src_ip = fields["src_ip"]
-    block_id = int(fields["block"])
-
-    for token in fields["dest_list"].split():
-        if ":" not in token:
-            continue
+    timestamp = ts_hdfs_compact(fields.date, fields.time)
+    src_ip = fields.rep_src_ip
+    block_id = int(fields.rep_block)
 
-        dest_ip = token.split(":", 1)[0]
+    # The dest list is whitespace-separated ``ip:port`` tokens.
+    for token in fields.rep_dest_list.split():
+        dest_ip = token.partition(":")[0]
 
         write_entry(
             writer_entry,
             LogType.HDFS_NAMESYSTEM,
-            deterministic_action_type_id(action),
+            action,
             timestamp,
             src_ip,
             dest_ip,
@@ -1,6 +1,7 @@
 import uuid
 from typing import Any, Dict, Optional
 
+from ids import deterministic_action_type_id
 from util import LogType
 
 
@@ -24,7 +25,7 @@ def write_entry(
 
     :param writer_entry: CSV DictWriter for log_entry rows.
     :param log_type: LogType for this entry.
-    :param action: Deterministic UUID string for the action type.
+    :param action: Action type name; written as-is and as its deterministic UUID.
     :param timestamp: Datetime object to serialize.
     :param source_ip: Source IP address (or None).
     :param dest_ip: Destination IP address (or None).
@@ -40,7 +41,8 @@ def write_entry(
     writer_entry.writerow({
         "id": entry_id,
         "log_type_id": log_type_ids[log_type],
-        "action_type_id": action,
+        "action_type_id": deterministic_action_type_id(action),
+        "action_type_name": action,
         "log_timestamp": timestamp.isoformat(),
         "source_ip": source_ip,
         "dest_ip": dest_ip,
@@ -56,7 +56,6 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -64,6 +63,13 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Templates are compiled once per process and reused by every render.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -82,10 +88,28 @@ DATABASES = {
         "PASSWORD": "admin123!",
         "HOST": "postgres",
         "PORT": "5432",
+        # Requests borrow backends from a process-wide psycopg pool instead
+        # of reconnecting for every stored procedure call; pooled ones are
+        # checked before reuse. Pooling replaces CONN_MAX_AGE, which must
+        # stay 0.
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "pool": {
+                "min_size": 5,
+                "max_size": 25,
+            },
+        },
     }
 }
 
 
+# Sessions are read through the cache and written through to the database,
+# so resolving request.user on every view costs a cache hit instead of a
+# django_session query.
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+# Where login_required sends anonymous requests (the ui "login" route).
+LOGIN_URL = "login"
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
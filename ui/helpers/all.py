@@ -1,4 +1,5 @@
 from .auth import *
 from .db import *
 from .queries import *
-from .context import *
\ No newline at end of file
+from .context import *
+from .stream import *
\ No newline at end of file
@@ -2,9 +2,18 @@
 def isUserLoggedIn(request): 
     return request.user.is_authenticated == True
 
+# Every anonymous visitor gets the same shared context. The views only
+# read it or combine it with "|", which copies.
+ANONYMOUS_USER = {
+    "isUserAuthenticated": False,
+    "user": ""
+}
+
 def getUser(request):
+    if not request.user.is_authenticated:
+        return ANONYMOUS_USER
     return {
-        "isUserAuthenticated": request.user.is_authenticated,
+        "isUserAuthenticated": True,
         "user": request.user.username
     }
 
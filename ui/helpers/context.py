@@ -1,5 +1,11 @@
 from .auth import getUser
+from .queries import getQuery
 
 def getContext(request):
     return getUser(request)
-    
\ No newline at end of file
+
+def getQueryContext(request):
+    # Resolves the user and the posted query in one pass for queriesHandler,
+    # which login_required only lets logged-in users reach. The query is
+    # None unless a known one was posted.
+    return getUser(request), getQuery(request)
@@ -1,62 +1,120 @@
+import re
 import time
-from .queries import hasQuery, getQuery
+import json
+import logging
+import hashlib
+import itertools
+from collections import namedtuple
+from datetime import date, datetime
+from django.core.cache import cache
 from django.db import connection, DatabaseError
 from .auth import getUserId
 
+logger = logging.getLogger(__name__)
+
 OMMITED_PARAMS = ['csrfmiddlewaretoken', 'query']
 
+# Result cache lifetimes in seconds. Parameter-free procedures only change
+# when new logs arrive, so they are kept longer.
+RESULTS_CACHE_TIMEOUT = 300
+STATIC_RESULTS_CACHE_TIMEOUT = 3600
+# Bumped whenever a log is inserted so cached results from before the
+# insert are no longer looked up. This does not refresh the materialized
+# views behind the fromMaterializedView queries; those only change with
+# the next bulk load.
+RESULTS_CACHE_GENERATION_KEY = 'sp_results_generation'
+
+# Rows pulled per round-trip from procedures read through a server-side cursor.
+RESULTS_FETCH_SIZE = 10000
+
+def toInt(value):
+    return int(value)
+
+def toDatetime(value):
+    return datetime.fromisoformat(value)
+
+def toDate(value):
+    return date.fromisoformat(value)
+
+# Posted form fields that are not plain text, converted once in Python so
+# they reach the procedures as real values instead of strings to be cast.
+PARAMETER_TYPES = {
+    'start_time': toDatetime,
+    'end_time': toDatetime,
+    'specific_timestamp': toDatetime,
+    'single_day': toDate,
+    'start_day': toDate,
+    'end_day': toDate,
+    'block_id': toInt,
+    'size_bytes': toInt,
+    'http_status': toInt,
+}
+
 STORED_PROCEDURES = {
     'storedProcedure01': {
         'sql': 'select * from fn_total_logs_per_action_type(%s, %s)',
-        'parameters': ['start_time', 'end_time']
+        'parameters': ['start_time', 'end_time'],
+        'cacheTimeout': RESULTS_CACHE_TIMEOUT
     },
     'storedProcedure02': {
         'sql': 'select * from fn_logs_per_day_for_action(%s, %s, %s)',
-        'parameters': ['action_type', 'start_time', 'end_time']
+        'parameters': ['action_type', 'start_time', 'end_time'],
+        'cacheTimeout': RESULTS_CACHE_TIMEOUT
     },
     'storedProcedure03': {
         'sql': 'select * from fn_most_common_action_per_source_ip(%s)',
-        'parameters': ['single_day']
+        'parameters': ['single_day'],
+        'serverSideCursor': True
     },
     'storedProcedure04': {
         'sql': 'select * from fn_top_blocks_by_actions_per_day(%s, %s)',
-        'parameters': ['start_day', 'end_day']
+        'parameters': ['start_day', 'end_day'],
+        'cacheTimeout': RESULTS_CACHE_TIMEOUT
     },
     'storedProcedure05': {
         'sql': 'select * from fn_referrers_multiple_resources()',
-        'parameters': []
+        'parameters': [],
+        'cacheTimeout': STATIC_RESULTS_CACHE_TIMEOUT
     },
     'storedProcedure06': {
         'sql': 'select * from fn_second_most_common_resource()',
-        'parameters': []
+        'parameters': [],
+        'cacheTimeout': STATIC_RESULTS_CACHE_TIMEOUT
     },
     'storedProcedure07': {
         'sql': 'select * from fn_access_logs_below_size(%s)',
-        'parameters': ['size_bytes']
+        'parameters': ['size_bytes'],
+        'serverSideCursor': True
     },
     'storedProcedure08': {
         'sql': 'select * from fn_blocks_rep_and_serv_same_day()',
-        'parameters': []
+        'parameters': [],
+        'cacheTimeout': STATIC_RESULTS_CACHE_TIMEOUT
     },
     'storedProcedure09': {
         'sql': 'select * from fn_blocks_rep_and_serv_same_day_hour()',
-        'parameters': []
+        'parameters': [],
+        'cacheTimeout': STATIC_RESULTS_CACHE_TIMEOUT
     },
     'storedProcedure10': {
         'sql': 'select * from fn_access_logs_by_user_agent_version(%s)',
-        'parameters': ['version']
+        'parameters': ['version'],
+        'serverSideCursor': True
     },
     'storedProcedure11': {
         'sql': "select * from fn_ips_with_method_in_range('ACCESS', %s, %s, %s)",
-        'parameters': ['action_type', 'start_time', 'end_time']
+        'parameters': ['action_type', 'start_time', 'end_time'],
+        'cacheTimeout': RESULTS_CACHE_TIMEOUT
     },
     'storedProcedure12': {
         'sql': "select * from fn_ips_with_two_methods_in_range('ACCESS', %s, %s, %s, %s)",
-        'parameters': ['action_type', 'action_type_2', 'start_time', 'end_time']
+        'parameters': ['action_type', 'action_type_2', 'start_time', 'end_time'],
+        'cacheTimeout': RESULTS_CACHE_TIMEOUT
     },
     'storedProcedure13': {
         'sql': "select * from fn_ips_with_n_methods_in_range('ACCESS', 4, %s, %s)",
-        'parameters': ['start_time', 'end_time']
+        'parameters': ['start_time', 'end_time'],
+        'cacheTimeout': RESULTS_CACHE_TIMEOUT
     },
     'fn_insert_log': {
         'sql': 'SELECT fn_insert_new_log(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
@@ -74,7 +132,8 @@ STORED_PROCEDURES = {
             'http_status',
             'referrer',
             'user_agent'
-        ]
+        ],
+        'invalidatesCache': True
     },
     'log_user_query': {
         'admin': True,
@@ -97,13 +156,143 @@ def getStoredProcedureParameters(key):
     return STORED_PROCEDURES.get(key).get('parameters')
 
 
-def executeQueryAndGetResults(request):
-    result = {}
-    if(hasQuery(request)):
-        result['selectedQuery'] = getQuery(request)
-        result['queryParams'] = getParams(request)
-        result['results'] = getResults(request)
-    return result
+def getResultsCacheKey(key, parameters):
+    generation = cache.get_or_set(RESULTS_CACHE_GENERATION_KEY, 0, None)
+    payload = key + json.dumps(parameters)
+    return 'sp:%s:%s' % (generation, hashlib.md5(payload.encode()).hexdigest())
+
+def invalidateResultsCache():
+    try:
+        cache.incr(RESULTS_CACHE_GENERATION_KEY)
+    except ValueError:
+        cache.set(RESULTS_CACHE_GENERATION_KEY, 1, None)
+
+
+def getPreparedStatements():
+    # Prepared statements live in the backend session, so they are tracked
+    # on the pooled DB-API connection, which outlives the Django wrapper
+    # that borrows it for one request.
+    raw = connection.connection
+    prepared = getattr(raw, 'preparedStatements', None)
+    if prepared is None:
+        prepared = raw.preparedStatements = set()
+    return prepared
+
+def getPreparedStatementSql(key):
+    counter = itertools.count(1)
+    sql = re.sub(r'%s', lambda match: '$%d' % next(counter), getStoredProcedure(key))
+    return 'PREPARE %s AS %s' % (key, sql)
+
+def getExecuteSql(key):
+    parameters = getStoredProcedureParameters(key)
+    if parameters:
+        return 'EXECUTE %s(%s)' % (key, ', '.join(['%s'] * len(parameters)))
+    return 'EXECUTE %s' % key
+
+# Everything run_log_analyzer needs per stored procedure, resolved once at
+# import instead of on every request.
+CompiledStoredProcedure = namedtuple('CompiledStoredProcedure', [
+    'sql', 'parameters', 'parameterTypes', 'prepareSql', 'executeSql', 'cacheTimeout',
+    'invalidatesCache', 'serverSideCursor'
+])
+
+COMPILED_STORED_PROCEDURES = {
+    key: CompiledStoredProcedure(
+        sql=sp['sql'],
+        parameters=tuple(sp.get('parameters') or ()),
+        parameterTypes=tuple(PARAMETER_TYPES.get(name) for name in sp.get('parameters') or ()),
+        prepareSql=getPreparedStatementSql(key),
+        executeSql=getExecuteSql(key),
+        cacheTimeout=sp.get('cacheTimeout'),
+        invalidatesCache=sp.get('invalidatesCache', False),
+        serverSideCursor=sp.get('serverSideCursor', False),
+    )
+    for key, sp in STORED_PROCEDURES.items()
+    if not sp.get('admin')
+}
+
+# Result column names per stored procedure. The procedures have fixed
+# signatures, so the names are read from the first cursor description only.
+STORED_PROCEDURE_COLUMNS = {}
+
+def getResultColumns(key, cursor):
+    columns = STORED_PROCEDURE_COLUMNS.get(key)
+    if columns is None:
+        columns = STORED_PROCEDURE_COLUMNS[key] = tuple(col[0] for col in cursor.description)
+    return columns
+
+def coerceParameters(compiled, params):
+    # Missing and empty fields become NULL rather than the string 'null'.
+    # A value that does not convert raises ValueError naming the field.
+    parameters = []
+    for key, toType in zip(compiled.parameters, compiled.parameterTypes):
+        value = params.get(key)
+        if value is None or value == '':
+            parameters.append(None)
+        elif toType is None:
+            parameters.append(value)
+        else:
+            try:
+                parameters.append(toType(value))
+            except ValueError:
+                raise ValueError(f"Invalid value for {key}: {value!r}") from None
+    return parameters
+
+def prepareStoredProcedure(cursor, key, compiled):
+    prepared = getPreparedStatements()
+    if key not in prepared:
+        cursor.execute(compiled.prepareSql)
+        prepared.add(key)
+
+def logUserQuery(cursor, userid, sql, rawParameters):
+    cursor.execute(STORED_PROCEDURES.get('log_user_query').get('sql'), [userid, sql, ', '.join(rawParameters)])
+
+class ServerSideRows:
+    # Rows of a named cursor, handed out in batches of RESULTS_FETCH_SIZE
+    # as they are iterated, so a response can stream them without the
+    # client ever holding the whole result. In autocommit the cursor is
+    # declared WITH HOLD, so the server materializes the whole result when
+    # the declaring transaction commits and keeps it on the (pooled)
+    # connection until the cursor is closed. close() must therefore always
+    # be called, whether or not every row was read.
+    def __init__(self, cursor, firstBatch):
+        self.cursor = cursor
+        self.firstBatch = firstBatch
+
+    def __bool__(self):
+        return bool(self.firstBatch)
+
+    def __iter__(self):
+        rows = self.firstBatch
+        while rows:
+            yield rows
+            rows = self.cursor.fetchmany(RESULTS_FETCH_SIZE)
+
+    def close(self):
+        self.cursor.close()
+
+def fetchWithServerSideCursor(key, compiled, parameters):
+    # Procedures that can return very large results are read through a
+    # named cursor. Only the first batch is fetched here; the rest is read
+    # while the response streams. DECLARE cannot wrap an EXECUTE, so these
+    # run the plain SQL rather than the prepared statement.
+    cursor = connection.chunked_cursor()
+    try:
+        cursor.execute(compiled.sql, parameters)
+        firstBatch = cursor.fetchmany(RESULTS_FETCH_SIZE)
+        columns = getResultColumns(key, cursor)
+    except BaseException:
+        cursor.close()
+        raise
+    return columns, ServerSideRows(cursor, firstBatch)
+
+def executeQueryAndGetResults(request, query):
+    params = getParams(request)
+    return {
+        'selectedQuery': query,
+        'queryParams': params,
+        'results': run_log_analyzer(query, params, getUserId(request))
+    }
 
 def getParams(request):
     params = {}
@@ -112,56 +301,82 @@ def getParams(request):
             params[key] = request.POST.get(key)
     return params
 
-def getResults(request): 
-    query = getQuery(request)
-    params = getParams(request)
-    userId = getUserId(request)
-    result = run_log_analyzer(query, params, userId)
-
-    return result
-
 def run_log_analyzer(query, params, userid):
     if query is None:
         raise ValueError(f"Unknown query method: {query}")
 
-    sql = getStoredProcedure(query.get('storedProcedure'))
-    parameters = []
-    if getStoredProcedureParameters(query.get('storedProcedure')) != None:
-        for key in getStoredProcedureParameters(query.get('storedProcedure')):
-            parameters.append(params.get(key, 'null'))
+    spKey = query.get('storedProcedure')
+    compiled = COMPILED_STORED_PROCEDURES[spKey]
+    sql = compiled.sql
+    rawParameters = [params.get(key, 'null') for key in compiled.parameters]
+
+    cacheTimeout = compiled.cacheTimeout
+    cacheKey = getResultsCacheKey(spKey, rawParameters) if cacheTimeout else None
 
     try:
         # 1. Obtain a cursor and execute the raw SQL
         with connection.cursor() as cursor:
+
+            # The query log insert runs first, as its own autocommit
+            # statement, so the audit row is kept even if the procedure
+            # fails. It is deliberately not pipelined with the EXECUTE:
+            # statements in one pipeline sync share an implicit
+            # transaction and would be rolled back together.
+            logUserQuery(cursor, userid, sql, rawParameters)
+
+            # Converted only after the log insert, so malformed input is
+            # audited too; it is shown on the results page, not as a 500.
+            try:
+                parameters = coerceParameters(compiled, params)
+            except ValueError as e:
+                return {'error': str(e)}
+
+            if cacheKey is not None:
+                cached = cache.get(cacheKey)
+                if cached is not None:
+                    return cached
             
-            # log user query
-            cursor.execute(STORED_PROCEDURES.get('log_user_query').get('sql'), [userid, sql, ', '.join(parameters)])
-            
+            if compiled.serverSideCursor:
+                start_time = time.perf_counter_ns()
+                columns, data = fetchWithServerSideCursor(spKey, compiled, parameters)
+                end_time = time.perf_counter_ns()
+                return {
+                    'columns': columns,
+                    'data': data,
+                    'executionTimeInMs': (end_time - start_time) / 1e6
+                }
+
+            prepareStoredProcedure(cursor, spKey, compiled)
+
             # IMPORTANT: Use placeholders (%s) and pass parameters separately 
             # to prevent SQL Injection.
-            start_time = time.time()
-            cursor.execute(sql, parameters)
-            end_time = time.time()
-            duration_ms = (end_time - start_time) * 1000
-            
+            start_time = time.perf_counter_ns()
+            cursor.execute(compiled.executeSql, parameters)
+            data = cursor.fetchall()
+            end_time = time.perf_counter_ns()
+            duration_ms = (end_time - start_time) / 1e6
 
-            # 2. Fetch column names and results
-            if cursor.description:
-                columns = [col[0] for col in cursor.description]
-                data = cursor.fetchall()
-                
-                # 3. Map results to a list of dictionaries
-                results = [dict(zip(columns, row)) for row in data]
-                return {
-                    'data': results,
-                    'executionTimeInMs': duration_ms
-                }
+            if compiled.invalidatesCache:
+                invalidateResultsCache()
+
+            # 2. Fetch column names; every procedure is a SELECT, so the
+            # description is always there once the rows are in
+            columns = getResultColumns(spKey, cursor)
 
-        return {
-                'data': {},
-                'executionTimeInMs': 10
+            # 3. Keep the rows as the tuples the cursor returns; the
+            # column names are sent once alongside them
+            result = {
+                'columns': columns,
+                'data': data,
+                'executionTimeInMs': duration_ms
             }
+            if cacheKey is not None:
+                # results.html keys its rendered grid on the same entry
+                result['cacheKey'] = cacheKey
+                result['cacheTimeout'] = cacheTimeout
+                cache.set(cacheKey, result, cacheTimeout)
+            return result
 
     except DatabaseError as e:
-        print(f"Database Error during SP execution: {e}")
+        logger.error('Database Error during SP execution of %s: %s', spKey, e)
         raise # Re-raise the error to be handled by the calling view
\ No newline at end of file
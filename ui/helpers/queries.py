@@ -1,10 +1,13 @@
+from types import MappingProxyType
+
 QUERY_DICTIONARY = {
     "01": {
         "title": "Find the total logs per type that were created within a specified time range in descending order",
         "htmlInputs": {
             "time_range": "required"
         },
-        "storedProcedure": "storedProcedure01"
+        "storedProcedure": "storedProcedure01",
+        "fromMaterializedView": True
     },
     "02": {
         "title": "Find the total logs per day for a specific action type and time range",
@@ -26,17 +29,20 @@ QUERY_DICTIONARY = {
         "htmlInputs": {
             "dayRange": "required"
         },
-        "storedProcedure": "storedProcedure04"
+        "storedProcedure": "storedProcedure04",
+        "fromMaterializedView": True
     },
     "05": {
         "title": "Find the referrers (if any) that have led to more than one resources",
         "htmlInputs": {},
-        "storedProcedure": "storedProcedure05"
+        "storedProcedure": "storedProcedure05",
+        "fromMaterializedView": True
     },
     "06": {
         "title": "Find the 2nd most common resource requested",
         "htmlInputs": {},
-        "storedProcedure": "storedProcedure06"
+        "storedProcedure": "storedProcedure06",
+        "fromMaterializedView": True
     },
     "07": {
         "title": "Find the access log (all fields) where the size is less than a specified number",
@@ -48,12 +54,14 @@ QUERY_DICTIONARY = {
     "08": {
         "title": "Find the blocks that have been replicated the same day that they have also been served",
         "htmlInputs": {},
-        "storedProcedure": "storedProcedure08"
+        "storedProcedure": "storedProcedure08",
+        "fromMaterializedView": True
     },
     "09": {
         "title": "Find the blocks that hae been replicated the same day and hour that they have also been served",
         "htmlInputs": {},
-        "storedProcedure": "storedProcedure09"
+        "storedProcedure": "storedProcedure09",
+        "fromMaterializedView": True
     },
     "10": {
         "title": "Find access logs that specified a particular version of Firefox as their browser",
@@ -114,16 +122,19 @@ QUERY_DICTIONARY = {
 }
 
 def hasQuery(request): 
-    return request.POST and request.POST.get('query') != None and QUERY_DICTIONARY[request.POST.get('query')] != None
+    return getQuery(request) is not None
 
 def getQuery(request):
-    if(hasQuery(request)):
-        return QUERY_DICTIONARY[request.POST.get('query')]
-    return None
+    queryKey = request.POST.get('query') if request.POST else None
+    return QUERY_DICTIONARY.get(queryKey) if queryKey else None
+
+# The query catalog is static, so the context built from it is made once
+# and shared read-only by every request.
+QUERIES_CONTEXT = MappingProxyType({
+    "queries": QUERY_DICTIONARY
+})
 
 def getQueriesDictionary():
-    return {
-        "queries": QUERY_DICTIONARY            
-    }
+    return QUERIES_CONTEXT
 
 
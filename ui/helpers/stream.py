@@ -0,0 +1,46 @@
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+from django.template.loader import get_template, render_to_string
+from .db import ServerSideRows
+
+# Rendered in place of the result rows of a streamed page; the page is
+# split on it and the rows are sent in between as they are fetched.
+RESULT_ROWS_MARKER = 'resultRowsMarker'
+
+class StreamedPage:
+    # The streamed response body. Django closes it when the response is
+    # done, which releases the server-side cursor behind the rows even if
+    # the client went away before they were all sent.
+    def __init__(self, head, rows, tail):
+        self.head = head
+        self.rows = rows
+        self.tail = tail
+
+    def __iter__(self):
+        rowsTemplate = get_template('ui/results_rows.html')
+        yield self.head
+        for batch in self.rows:
+            yield rowsTemplate.render({'rows': batch})
+        yield self.tail
+
+    def close(self):
+        self.rows.close()
+
+def renderResults(request, templateName, context):
+    rows = context['results'].get('data') if context.get('results') else None
+    if not isinstance(rows, ServerSideRows):
+        return render(request, templateName, context)
+
+    page = render_to_string(templateName, context | {'resultRowsMarker': RESULT_ROWS_MARKER}, request)
+    # Only the rendered query parameters can repeat the marker, and they
+    # come before the rows, so the last occurrence is the placeholder.
+    head, tail = page.rsplit(RESULT_ROWS_MARKER, 1)
+    return StreamingHttpResponse(StreamedPage(head, rows, tail))
+
+def closeResults(queryResults):
+    # Releases the server-side cursor behind results that never made it
+    # into a streamed response. Closing an already closed cursor is a no-op.
+    results = queryResults.get('results')
+    rows = results.get('data') if results else None
+    if isinstance(rows, ServerSideRows):
+        rows.close()
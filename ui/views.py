@@ -1,10 +1,28 @@
-import psycopg2
-
+import hashlib
+from functools import cache
 from django.shortcuts import render, redirect
+from django.template.loader import get_template
 from django.contrib.auth import login, logout
+from django.contrib.auth.decorators import login_required
+from django.views.decorators.cache import cache_page, never_cache
+from django.views.decorators.csrf import csrf_protect
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
 from ui.forms import CustomLoginForm, CustomUserCreationForm
-from .helpers.all import isUserLoggedIn, hasQuery, getQueriesDictionary, executeQueryAndGetResults, getContext
+from .helpers.all import isUserLoggedIn, getQueriesDictionary, executeQueryAndGetResults, getContext, getQueryContext, renderResults, closeResults
+
+# Rendered login and register pages are reused for repeat GETs. They hold
+# a CSRF token and the session user, so copies are kept per cookie; POSTs
+# are never cached. csrf_protect sits below cache_page so the CSRF cookie
+# and its Vary: Cookie are set before the cache sees the response, which
+# keeps a cookie-less first visit from being stored. never_cache keeps
+# browsers from re-showing a form whose token was rotated at login.
+AUTH_PAGE_CACHE_TIMEOUT = 300
 
+@never_cache
+@cache_page(AUTH_PAGE_CACHE_TIMEOUT)
+@csrf_protect
+@vary_on_cookie
 def loginHandler(request):
     if request.method == 'POST':
         form = CustomLoginForm(data=request.POST)
@@ -18,6 +36,10 @@ def loginHandler(request):
     return render(request, 'ui/login.html', context)
 
 
+@never_cache
+@cache_page(AUTH_PAGE_CACHE_TIMEOUT)
+@csrf_protect
+@vary_on_cookie
 def registerHandler(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
@@ -35,6 +57,24 @@ def logoutHandler(request):
     return redirect('/')
 
 
+# The anonymous landing page is the same for every visitor and depends only
+# on its templates, so their source hash is its ETag and repeat visits get
+# a 304 without rendering. Logged-in users get no ETag.
+ANONYMOUS_PAGE_TEMPLATES = ('ui/template.html', 'ui/base.html')
+
+@cache
+def getAnonymousPageEtag():
+    digest = hashlib.md5()
+    for name in ANONYMOUS_PAGE_TEMPLATES:
+        digest.update(get_template(name).template.source.encode())
+    return digest.hexdigest()
+
+def getUrlHandlerEtag(request):
+    if(isUserLoggedIn(request)):
+        return None
+    return getAnonymousPageEtag()
+
+@condition(etag_func=getUrlHandlerEtag)
 def urlHandler(request):
     context = getContext(request)
     if(isUserLoggedIn(request)):
@@ -43,9 +83,16 @@ def urlHandler(request):
     else:
         return render(request, "ui/template.html", context)
 
+@login_required
 def queriesHandler(request):
-    context = getContext(request)
-    if(isUserLoggedIn(request) and hasQuery(request)):
-        context = context | executeQueryAndGetResults(request)
-        return render(request, "ui/results.html", context)
-    return redirect("/")
+    context, query = getQueryContext(request)
+    if(query is None):
+        return redirect("/")
+    queryResults = executeQueryAndGetResults(request, query)
+    # Until the streamed response owns them, streamed results hold a
+    # server-side cursor that must be released if rendering fails.
+    try:
+        return renderResults(request, "ui/results.html", context | queryResults)
+    except BaseException:
+        closeResults(queryResults)
+        raise